@@ -1,21 +1,30 @@
+import asyncio
+import html
 import logging
+import time
 from datetime import datetime, timedelta
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery, FSInputFile
 from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
-from asyncio import sleep
+from aiogram.exceptions import TelegramBadRequest
 
-from database import Database, Movie
+from database import Database, Movie, MEDIA_VIDEO, MEDIA_DOCUMENT
 from config import config
 from filters import IsAdmin, IsAdminCallback
 from keyboards import (
     get_admin_panel_kb, get_back_to_admin_kb,
     get_cancel_kb, get_confirmation_kb, get_quality_kb
 )
-from utils import format_movie_info, format_number, create_progress_bar
+from utils import (
+    format_number, format_stats_age,
+    create_progress_bar, invalidate_subscription_cache
+)
+from broadcast import start_broadcast_job
+from catalog_import import CatalogImportError, ImportReport, iter_rows, validate_row
+from channel_posts import post_movie_to_channel, queue_channel_posts
+from middlewares import ThrottlingMiddleware
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -43,6 +52,9 @@ class AdminStates(StatesGroup):
     # Kino o'chirish
     DeleteMovieCode = State()
     
+    # Katalog importi
+    ImportCatalog = State()
+    
     # Rassilka
     BroadcastMessage = State()
     BroadcastConfirm = State()
@@ -58,15 +70,15 @@ async def admin_panel(message: Message, state: FSMContext, db: Database):
     """Admin panel"""
     await state.clear()
     
-    stats = await db.get_global_stats()
-    active_users = await db.get_active_users_count(7)
+    stats = await db.get_stats_snapshot()
     
     text = (
         "🛠 <b>Admin Panel</b>\n\n"
-        f"👥 Jami foydalanuvchilar: {format_number(stats['users_count'])}\n"
-        f"🟢 Aktiv (7 kun): {format_number(active_users)}\n"
-        f"🎬 Jami kinolar: {format_number(stats['movies_count'])}\n"
-        f"👁 Jami ko'rishlar: {format_number(stats['total_views'])}\n\n"
+        f"👥 Jami foydalanuvchilar: {format_number(stats.users_count)}\n"
+        f"🟢 Aktiv (7 kun): {format_number(stats.active_7d)}\n"
+        f"🎬 Jami kinolar: {format_number(stats.movies_count)}\n"
+        f"👁 Jami ko'rishlar: {format_number(stats.total_views)}\n"
+        f"{format_stats_age(stats.refreshed_at)}\n\n"
         f"Quyidagi amallardan birini tanlang:"
     )
     
@@ -79,6 +91,36 @@ async def admin_panel_back(call: CallbackQuery, state: FSMContext, db: Database)
     await admin_panel(call.message, state, db)
     await call.answer()
 
+@router.message(Command("slowqueries"), IsAdmin())
+async def slow_queries(message: Message, db: Database, command: CommandObject):
+    """Eng sekin SQL so'rovlar: /slowqueries [soni]"""
+    limit = int(command.args) if command.args and command.args.isdigit() else 5
+    top = db.profiler.top(min(limit, 20))
+    
+    if not top:
+        await message.answer("Hozircha so'rovlar yozilmagan.")
+        return
+    
+    text = f"🐢 <b>Eng sekin so'rovlar</b> (chegara: {config.SLOW_QUERY_MS} ms)\n\n"
+    for i, stats in enumerate(top, 1):
+        statement = html.escape(" ".join(stats.statement.split())[:300])
+        entry = (
+            f"{i}. <b>{stats.method}</b>\n"
+            f"max {stats.max_time * 1000:.0f} ms | o'rtacha {stats.avg_time * 1000:.1f} ms | "
+            f"{format_number(stats.calls)} marta | sekin: {stats.slow_calls}\n"
+            f"qatorlar: {format_number(stats.rows)} | pool: {stats.pool_wait * 1000:.0f} ms\n"
+            f"<code>{statement}</code>\n"
+        )
+        if stats.plan:
+            plan = html.escape("\n".join(stats.plan.splitlines()[:8]))
+            entry += f"<pre>{plan}</pre>\n"
+        # Telegram xabar chegarasi (4096)
+        if len(text) + len(entry) > 4000:
+            break
+        text += entry + "\n"
+    
+    await message.answer(text, parse_mode="HTML")
+
 # --- Kino Qo'shish ---
 
 @router.callback_query(F.data == "admin_add_movie", IsAdminCallback())
@@ -100,13 +142,15 @@ async def get_movie_file(message: Message, state: FSMContext):
     """Kino faylini qabul qilish"""
     if message.video:
         file_id = message.video.file_id
+        media_type = MEDIA_VIDEO
     elif message.document:
         file_id = message.document.file_id
+        media_type = MEDIA_DOCUMENT
     else:
         await message.answer("❌ Iltimos, faqat video yoki document yuboring!")
         return
 
-    await state.update_data(file_id=file_id)
+    await state.update_data(file_id=file_id, media_type=media_type)
     await message.answer(
         "2️⃣/11 Kino uchun noyob kodni kiriting:\n\n"
         "Masalan: <code>/code 1234</code>\n\n"
@@ -322,7 +366,8 @@ async def finalize_movie(message: Message, state: FSMContext, db: Database, bot:
             duration=data.get('duration'),
             quality=data.get('quality', 'HD'),
             imdb_rating=data.get('imdb_rating'),
-            thumbnail_file_id=thumbnail_file_id
+            thumbnail_file_id=thumbnail_file_id,
+            media_type=data.get('media_type')
         )
         
         logger.info(f"Yangi kino qo'shildi: {movie.title} (kod: {movie.code})")
@@ -334,32 +379,8 @@ async def finalize_movie(message: Message, state: FSMContext, db: Database, bot:
         return
     
     # Kanalga post yuborish
-    bot_info = await bot.get_me()
-    rating = await db.get_movie_rating(movie.id)
-    
-    post_text = format_movie_info(movie, rating)
-    post_text += f"\n\n👇 Kinoni olish uchun botga o'ting:"
-    
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    kb = InlineKeyboardBuilder()
-    kb.button(text="🎬 Kinoni olish", url=f"https://t.me/{bot_info.username}?start=code_{movie.code}")
-    
     try:
-        if thumbnail_file_id:
-            await bot.send_photo(
-                chat_id=config.CHANNEL_USERNAME,
-                photo=thumbnail_file_id,
-                caption=post_text,
-                reply_markup=kb.as_markup(),
-                parse_mode="HTML"
-            )
-        else:
-            await bot.send_message(
-                chat_id=config.CHANNEL_USERNAME,
-                text=post_text,
-                reply_markup=kb.as_markup(),
-                parse_mode="HTML"
-            )
+        await post_movie_to_channel(bot, movie)
         await message.answer(
             f"✅ Kino muvaffaqiyatli qo'shildi va kanalga joylandi!\n\n"
             f"🎬 Nomi: {movie.title}\n"
@@ -378,34 +399,173 @@ async def finalize_movie(message: Message, state: FSMContext, db: Database, bot:
     await state.clear()
     await admin_panel(message, state, db)
 
+# --- Katalog importi ---
+
+IMPORT_EXTENSIONS = (".csv", ".json", ".jsonl")
+IMPORT_PROGRESS_INTERVAL = 2.0  # progress xabarini tahrirlash oralig'i (s)
+
+@router.callback_query(F.data == "admin_import", IsAdminCallback())
+async def import_start(call: CallbackQuery, state: FSMContext):
+    """Katalog importini boshlash"""
+    await state.clear()
+    await call.message.edit_text(
+        "📥 <b>Katalog importi</b>\n\n"
+        "CSV yoki JSON faylni document sifatida yuboring.\n\n"
+        "Ustunlar: <code>code, file_id, title, genre</code> (majburiy), "
+        "<code>description, year, country, duration, quality, imdb_rating, "
+        "thumbnail_file_id, media_type</code>\n\n"
+        "💡 JSON: obyektlar massivi yoki har qatorda bitta obyekt.",
+        reply_markup=get_cancel_kb(),
+        parse_mode="HTML"
+    )
+    await state.set_state(AdminStates.ImportCatalog)
+    await call.answer()
+
+@router.message(AdminStates.ImportCatalog, F.document, IsAdmin())
+async def import_catalog(message: Message, state: FSMContext, db: Database, bot: Bot):
+    """Faylni o'qish, tekshirish va kinolarni partiyalab qo'shish"""
+    document = message.document
+    filename = document.file_name or ""
+    if not filename.lower().endswith(IMPORT_EXTENSIONS):
+        await message.answer("❌ Faqat .csv, .json yoki .jsonl fayl yuboring!")
+        return
+    if document.file_size and document.file_size > config.IMPORT_MAX_FILE_MB * 1024 * 1024:
+        await message.answer(f"❌ Fayl hajmi {config.IMPORT_MAX_FILE_MB} MB dan oshmasligi kerak!")
+        return
+    await state.clear()
+
+    progress = await message.answer("📥 Fayl yuklanmoqda...")
+    report = ImportReport()
+    rows = {}
+    try:
+        stream = await bot.download(document)
+        for index, (line, raw) in enumerate(iter_rows(stream, filename), 1):
+            report.total += 1
+            try:
+                row = validate_row(raw)
+            except ValueError as e:
+                report.add_error(line, str(e))
+                continue
+            if row["code"] in rows:
+                report.duplicates += 1
+            else:
+                rows[row["code"]] = row
+            if index % 1000 == 0:
+                await asyncio.sleep(0)  # katta faylda event loop bloklanmasin
+    except CatalogImportError as e:
+        await progress.edit_text(f"❌ Faylni o'qib bo'lmadi: {e}")
+        return
+    except Exception as e:
+        logger.error(f"Import faylini o'qishda xatolik: {e}")
+        await progress.edit_text(f"❌ Xatolik: {e}")
+        return
+
+    try:
+        existing = await db.get_existing_movie_codes(list(rows))
+    except Exception as e:
+        logger.error(f"Importda mavjud kodlarni tekshirishda xatolik: {e}")
+        await progress.edit_text(f"❌ Bazada xatolik, hech narsa qo'shilmadi: {e}")
+        return
+    report.existing = len(existing)
+    new_rows = [row for code, row in rows.items() if code not in existing]
+
+    inserted = []
+    last_edit = 0.0
+    for start in range(0, len(new_rows), config.IMPORT_BATCH_SIZE):
+        batch = new_rows[start:start + config.IMPORT_BATCH_SIZE]
+        try:
+            inserted.extend(await db.add_movies_bulk(batch))
+        except Exception as e:
+            # Oldingi partiyalar saqlangan - admin qayta yuborsa ular "mavjud" deb o'tkaziladi
+            logger.error(f"Importda kinolarni qo'shishda xatolik ({start + 1}-{start + len(batch)}): {e}")
+            await progress.edit_text(
+                f"❌ Import to'xtadi: bazada xatolik!\n\n"
+                f"➕ Qo'shildi: {len(inserted)}\n"
+                f"⏭ Qolgan: {len(new_rows) - start}\n\n"
+                f"Xatolik: {e}\n\n"
+                f"💡 Faylni qayta yuborishingiz mumkin - qo'shilganlar takrorlanmaydi."
+            )
+            if inserted and config.CHANNEL_USERNAME:
+                queue_channel_posts(bot, inserted, notify_chat_id=message.chat.id)
+            return
+        done = start + len(batch)
+        if time.monotonic() - last_edit >= IMPORT_PROGRESS_INTERVAL or done == len(new_rows):
+            last_edit = time.monotonic()
+            try:
+                await progress.edit_text(
+                    f"📥 Kinolar qo'shilmoqda...\n\n"
+                    f"{create_progress_bar(done, len(new_rows))}\n"
+                    f"{done} / {len(new_rows)}"
+                )
+            except TelegramBadRequest:
+                pass
+    # Tekshiruv va INSERT orasida boshqa admin qo'shgan kodlar
+    report.existing += len(new_rows) - len(inserted)
+    report.inserted = len(inserted)
+    logger.info(f"Katalog importi: {report.inserted} ta kino qo'shildi ({filename})")
+
+    text = (
+        f"✅ <b>Import yakunlandi!</b>\n\n"
+        f"📄 Jami qatorlar: {report.total}\n"
+        f"➕ Qo'shildi: {report.inserted}\n"
+        f"🔁 Faylda takror: {report.duplicates}\n"
+        f"📦 Bazada mavjud: {report.existing}\n"
+        f"❌ Xato: {report.invalid}"
+    )
+    if report.errors:
+        text += "\n\n<b>Xatolar:</b>\n" + "\n".join(html.escape(error) for error in report.errors)
+        if report.invalid > len(report.errors):
+            text += f"\n... va yana {report.invalid - len(report.errors)} ta"
+    if inserted and config.CHANNEL_USERNAME:
+        queue_channel_posts(bot, inserted, notify_chat_id=message.chat.id)
+        text += f"\n\n📢 {len(inserted)} ta post kanalga navbat bilan joylanadi."
+    await message.answer(text, parse_mode="HTML")
+    await admin_panel(message, state, db)
+
+@router.message(AdminStates.ImportCatalog, IsAdmin())
+async def import_catalog_invalid(message: Message):
+    """Fayl o'rniga boshqa xabar"""
+    await message.answer("❌ Iltimos, CSV yoki JSON faylni document sifatida yuboring!")
+
 # --- Statistika ---
 
 @router.callback_query(F.data == "admin_stats", IsAdminCallback())
-async def admin_stats(call: CallbackQuery, db: Database):
+async def admin_stats(call: CallbackQuery, db: Database, throttling: ThrottlingMiddleware):
     """Admin statistika"""
-    stats = await db.get_global_stats()
-    active_1d = await db.get_active_users_count(1)
-    active_7d = await db.get_active_users_count(7)
-    active_30d = await db.get_active_users_count(30)
+    stats = await db.get_stats_snapshot()
     
     top_movies = await db.get_top_movies(5)
     
     text = "📊 <b>Batafsil Statistika</b>\n\n"
     text += "<b>👥 Foydalanuvchilar:</b>\n"
-    text += f"Jami: {format_number(stats['users_count'])}\n"
-    text += f"🟢 Aktiv (24 soat): {format_number(active_1d)}\n"
-    text += f"🟡 Aktiv (7 kun): {format_number(active_7d)}\n"
-    text += f"🔵 Aktiv (30 kun): {format_number(active_30d)}\n\n"
+    text += f"Jami: {format_number(stats.users_count)}\n"
+    text += f"🟢 Aktiv (24 soat): {format_number(stats.active_1d)}\n"
+    text += f"🟡 Aktiv (7 kun): {format_number(stats.active_7d)}\n"
+    text += f"🔵 Aktiv (30 kun): {format_number(stats.active_30d)}\n\n"
     
     text += "<b>🎬 Kinolar:</b>\n"
-    text += f"Jami: {format_number(stats['movies_count'])}\n"
-    text += f"Jami ko'rishlar: {format_number(stats['total_views'])}\n\n"
+    text += f"Jami: {format_number(stats.movies_count)}\n"
+    text += f"Jami ko'rishlar: {format_number(stats.total_views)}\n\n"
+    
+    cache_stats = db.get_cache_stats()
+    text += "<b>💾 Kino keshi:</b>\n"
+    text += f"Hajmi: {cache_stats['size']} | Hit: {format_number(cache_stats['hits'])} | Miss: {format_number(cache_stats['misses'])}\n"
+    text += f"Hit rate: {cache_stats['hit_rate'] * 100:.1f}%\n\n"
+    
+    flood_stats = throttling.stats()
+    text += "<b>🛡 Anti-flood:</b>\n"
+    text += f"O'tkazildi: {format_number(flood_stats['passed'])} | Tashlandi: {format_number(flood_stats['dropped'])}\n"
+    for update_type, count in flood_stats['dropped_by_type'].items():
+        text += f"  {update_type}: {format_number(count)}\n"
+    text += "\n"
     
     if top_movies:
         text += "<b>🔥 Top 5 kinolar:</b>\n"
         for i, movie in enumerate(top_movies, 1):
             text += f"{i}. {movie.title} - {format_number(movie.views_count)} 👁\n"
     
+    text += f"\n{format_stats_age(stats.refreshed_at)}"
+    
     await call.message.edit_text(text, reply_markup=get_back_to_admin_kb(), parse_mode="HTML")
     await call.answer()
 
@@ -441,11 +601,7 @@ async def broadcast_execute(call: CallbackQuery, state: FSMContext, db: Database
     data = await state.get_data()
     await state.clear()
     
-    user_ids = await db.get_all_user_ids()
-    total = len(user_ids)
-    sent = 0
-    failed = 0
-    blocked = 0
+    total = await db.get_users_count()
     
     msg = await call.message.edit_text(
         f"📤 Rassilka boshlandi...\n\n"
@@ -453,42 +609,14 @@ async def broadcast_execute(call: CallbackQuery, state: FSMContext, db: Database
         f"0 / {total}"
     )
     
-    for i, user_id in enumerate(user_ids, 1):
-        try:
-            await bot.copy_message(
-                chat_id=user_id,
-                from_chat_id=data['chat_id'],
-                message_id=data['message_id']
-            )
-            sent += 1
-        except TelegramForbiddenError:
-            blocked += 1
-        except Exception:
-            failed += 1
-        
-        # Progress yangilash (har 50 tadan)
-        if i % 50 == 0 or i == total:
-            try:
-                await msg.edit_text(
-                    f"📤 Rassilka davom etmoqda...\n\n"
-                    f"{create_progress_bar(i, total)}\n"
-                    f"{i} / {total}"
-                )
-            except:
-                pass
-        
-        await sleep(config.MAX_BROADCAST_RATE)
-    
-    result_text = (
-        f"✅ <b>Rassilka yakunlandi!</b>\n\n"
-        f"📊 Natijalar:\n"
-        f"✅ Yuborildi: {sent}\n"
-        f"🚫 Bloklangan: {blocked}\n"
-        f"❌ Xatolik: {failed}\n"
-        f"📊 Jami: {total}"
+    job = await db.create_broadcast_job(
+        from_chat_id=data['chat_id'],
+        message_id=data['message_id'],
+        total=total,
+        progress_chat_id=msg.chat.id,
+        progress_message_id=msg.message_id
     )
-    
-    await msg.edit_text(result_text, parse_mode="HTML")
+    start_broadcast_job(bot, db, job)
     await call.answer()
 
 @router.callback_query(F.data == "cancel_broadcast", IsAdminCallback())
@@ -568,7 +696,11 @@ async def fsub_add_username(message: Message, state: FSMContext, bot: Bot):
             await message.answer("❌ Bot bu kanalning admini emas!")
             return
         
-        await state.update_data(channel_id=channel_id)
+        await state.update_data(
+            channel_id=channel_id,
+            channel_username=chat.username,
+            invite_link=chat.invite_link
+        )
         await message.answer("Kanal nomini kiriting (bu nom tugmada ko'rinadi):")
         await state.set_state(AdminStates.AddChannelTitle)
         
@@ -585,7 +717,13 @@ async def fsub_add_finish(message: Message, state: FSMContext, db: Database):
     title = message.text
     
     try:
-        await db.add_required_channel(channel_id, title)
+        await db.add_required_channel(
+            channel_id,
+            title,
+            username=data.get("channel_username"),
+            invite_link=data.get("invite_link")
+        )
+        invalidate_subscription_cache()
         await message.answer(f"✅ Kanal qo'shildi:\n{title} (ID: {channel_id})")
     except Exception:
         await message.answer("❌ Bu kanal allaqachon qo'shilgan!")
@@ -598,6 +736,7 @@ async def fsub_delete(call: CallbackQuery, db: Database):
     """Kanalni o'chirish"""
     channel_id = int(call.data.split("_")[2])
     await db.delete_required_channel(channel_id)
+    invalidate_subscription_cache()
     await call.answer("✅ Kanal o'chirildi!")
     await fsub_menu(call, db)
 
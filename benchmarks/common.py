@@ -0,0 +1,60 @@
+import os
+import statistics
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Sequence
+
+
+
+def bench_database_url() -> str:
+    """
+    Benchmarklar uchun alohida baza.
+    Jadvallarga test ma'lumotlari yoziladi - production bazani ishlatmang!
+    """
+    url = os.getenv("BENCH_DATABASE_URL")
+    if not url:
+        raise SystemExit("BENCH_DATABASE_URL o'rnatilmagan (production DATABASE_URL ishlatilmaydi)")
+    return url
+
+
+def percentile(samples: Sequence[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """Latency namunalari (soniya) -> millisekundlardagi xulosa"""
+    return {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p95_ms': percentile(samples, 95) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000,
+        'max_ms': max(samples) * 1000 if samples else 0.0,
+    }
+
+
+def format_summary(name: str, samples: Sequence[float]) -> str:
+    s = summarize(samples)
+    return (
+        f"{name:<32} n={s['count']:<6} mean={s['mean_ms']:8.2f}ms "
+        f"p50={s['p50_ms']:8.2f}ms p95={s['p95_ms']:8.2f}ms p99={s['p99_ms']:8.2f}ms"
+    )
+
+
+class Timer:
+    """async with timer.measure(): ... -> samples ro'yxatiga qo'shadi"""
+
+    def __init__(self):
+        self.samples: List[float] = []
+
+    @asynccontextmanager
+    async def measure(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append(time.perf_counter() - started)
@@ -0,0 +1,221 @@
+"""
+Sintetik ma'lumotlar generatori: production hajmidagi jadvallar (asyncpg COPY bilan).
+
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.datagen \\
+        --users 1000000 --movies 20000 --views 5000000 --ratings 1000000 --zipf 1.1
+
+Ko'rishlar va baholar Zipf taqsimotida: bir nechta mashhur kino va faol foydalanuvchilar
+yuklamaning katta qismini beradi. Yuklangandan keyin movies.views_count va reyting
+agregatlari jadvallardan qayta hisoblanadi.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Iterator, List, Sequence
+
+from sqlalchemy import delete, select, text
+
+from benchmarks.common import bench_database_url
+from benchmarks.search import GENRES, WORDS
+from database import Database, Movie, MovieRating, MovieView, User
+
+USER_ID_OFFSET = 7_000_000_000  # sintetik foydalanuvchilar ID si
+CODE_OFFSET = 800_000_000  # sintetik kinolar kodi
+
+USER_COLUMNS = ["id", "username", "first_name", "language", "is_premium", "joined_at", "last_active"]
+MOVIE_COLUMNS = [
+    "code", "file_id", "title", "genre", "description", "year", "country", "duration",
+    "language", "quality", "imdb_rating", "media_type", "views_count", "rating_sum",
+    "rating_count", "version", "is_active", "added_at",
+]
+VIEW_COLUMNS = ["user_id", "movie_id", "viewed_at"]
+RATING_COLUMNS = ["user_id", "movie_id", "rating", "created_at"]
+
+COUNTRIES = ["AQSH", "Buyuk Britaniya", "Fransiya", "Hindiston", "Koreya", "Turkiya", "O'zbekiston"]
+QUALITIES = ["HD", "Full HD", "4K"]
+RATING_WEIGHTS = [5, 10, 20, 35, 30]  # 1..5 yulduz
+
+
+def zipf_cum_weights(n: int, s: float) -> List[float]:
+    """k-o'rindagi element ehtimoli ~ 1/k^s (random.choices uchun kumulyativ)"""
+    return list(itertools.accumulate(1 / (k ** s) for k in range(1, n + 1)))
+
+
+def chunked(iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def random_time(now: datetime, days: int) -> datetime:
+    return now - timedelta(seconds=random.randint(0, days * 86400))
+
+
+def generate_users(count: int, now: datetime) -> Iterator[tuple]:
+    for i in range(count):
+        joined_at = random_time(now, 365)
+        # Ko'pchilik foydalanuvchi yaqinda faol emas
+        last_active = max(joined_at, now - timedelta(days=random.expovariate(1 / 20)))
+        yield (
+            USER_ID_OFFSET + i, f"user{i}", f"User {i}", "uz", random.random() < 0.05,
+            joined_at, last_active,
+        )
+
+
+def generate_movies(count: int, now: datetime) -> Iterator[tuple]:
+    for i in range(count):
+        yield (
+            CODE_OFFSET + i,
+            f"BAACAgIAAxkBAAI{i:x}bench",  # video turidagi file_id ko'rinishi
+            " ".join(random.sample(WORDS, random.randint(1, 4))).title(),
+            ", ".join(random.sample(GENRES, random.randint(1, 2))),
+            "Sintetik kino tavsifi " + " ".join(random.sample(WORDS, 8)),
+            random.randint(1970, now.year),
+            random.choice(COUNTRIES),
+            random.randint(70, 180),
+            "uz",
+            random.choice(QUALITIES),
+            round(random.uniform(4.0, 9.5), 1),
+            "video",
+            0, 0, 0, 1, True,
+            random_time(now, 3 * 365),
+        )
+
+
+def generate_views(
+    count: int, user_ids: Sequence[int], user_weights: List[float],
+    movie_ids: Sequence[int], movie_weights: List[float], now: datetime, chunk: int
+) -> Iterator[List[tuple]]:
+    for size in _chunk_sizes(count, chunk):
+        users = random.choices(user_ids, cum_weights=user_weights, k=size)
+        movies = random.choices(movie_ids, cum_weights=movie_weights, k=size)
+        yield [(u, m, random_time(now, 90)) for u, m in zip(users, movies)]
+
+
+def generate_ratings(
+    count: int, user_ids: Sequence[int], user_weights: List[float],
+    movie_ids: Sequence[int], movie_weights: List[float], now: datetime, chunk: int
+) -> Iterator[List[tuple]]:
+    """(user_id, movie_id) noyob bo'lishi kerak - takrorlar tashlanadi"""
+    seen = set()
+    stride = max(movie_ids) + 1
+    generated = 0
+    while generated < count:
+        size = min(chunk, count - generated)
+        users = random.choices(user_ids, cum_weights=user_weights, k=size)
+        movies = random.choices(movie_ids, cum_weights=movie_weights, k=size)
+        ratings = random.choices(range(1, 6), weights=RATING_WEIGHTS, k=size)
+        rows = []
+        for u, m, r in zip(users, movies, ratings):
+            key = u * stride + m
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append((u, m, r, random_time(now, 90)))
+        if not rows:
+            # Juftliklar tugab qoldi (kam foydalanuvchi/kino)
+            break
+        generated += len(rows)
+        yield rows
+
+
+def _chunk_sizes(count: int, chunk: int) -> Iterator[int]:
+    while count > 0:
+        yield min(chunk, count)
+        count -= chunk
+
+
+async def copy_rows(db: Database, table: str, columns: List[str], chunks) -> int:
+    """Chunklarni asyncpg COPY bilan yozish"""
+    total = 0
+    started = time.perf_counter()
+    async with db.engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        for rows in chunks:
+            await raw.driver_connection.copy_records_to_table(table, records=rows, columns=columns)
+            total += len(rows)
+            print(f"\r  {table}: {total:,} qator ({total / (time.perf_counter() - started):,.0f}/s)", end="", flush=True)
+    print()
+    return total
+
+
+async def truncate(db: Database):
+    """Oldingi sintetik ma'lumotlarni o'chirish (ko'rish/baholar CASCADE bilan)"""
+    async with db.session_maker() as session:
+        await session.execute(delete(Movie).where(Movie.code >= CODE_OFFSET, Movie.code < CODE_OFFSET + 10**8))
+        await session.execute(delete(User).where(User.id >= USER_ID_OFFSET))
+        await session.commit()
+
+
+async def reconcile(db: Database):
+    """Yuklangan ko'rishlar va baholardan agregatlarni qayta hisoblash"""
+    async with db.session_maker() as session:
+        await session.execute(text(
+            "UPDATE movies SET views_count = counts.views "
+            "FROM (SELECT movie_id, count(*) AS views FROM movie_views GROUP BY movie_id) AS counts "
+            "WHERE movies.id = counts.movie_id"
+        ))
+        await session.commit()
+    await db.reconcile_movie_ratings()
+    async with db.session_maker() as session:
+        for table in (User.__tablename__, Movie.__tablename__, MovieView.__tablename__, MovieRating.__tablename__):
+            await session.execute(text(f"ANALYZE {table}"))
+        await session.commit()
+
+
+async def main(args: argparse.Namespace):
+    random.seed(args.seed)
+    db = Database(bench_database_url())
+    await db.init_db()
+    now = datetime.utcnow()
+    try:
+        if args.truncate:
+            await truncate(db)
+
+        print("Generatsiya va yuklash:")
+        await copy_rows(db, User.__tablename__, USER_COLUMNS, chunked(generate_users(args.users, now), args.chunk))
+        await copy_rows(db, Movie.__tablename__, MOVIE_COLUMNS, chunked(generate_movies(args.movies, now), args.chunk))
+
+        async with db.session_maker() as session:
+            movie_ids = (await session.execute(
+                select(Movie.id)
+                .where(Movie.code >= CODE_OFFSET, Movie.code < CODE_OFFSET + args.movies)
+                .order_by(Movie.code)
+            )).scalars().all()
+        user_ids = [USER_ID_OFFSET + i for i in range(args.users)]
+
+        # Mashhurlik tartibi tasodifiy (kod tartibi bilan bog'liq bo'lmasin)
+        random.shuffle(movie_ids)
+        random.shuffle(user_ids)
+        movie_weights = zipf_cum_weights(len(movie_ids), args.zipf)
+        user_weights = zipf_cum_weights(len(user_ids), args.user_zipf)
+
+        await copy_rows(db, MovieView.__tablename__, VIEW_COLUMNS, generate_views(
+            args.views, user_ids, user_weights, movie_ids, movie_weights, now, args.chunk
+        ))
+        await copy_rows(db, MovieRating.__tablename__, RATING_COLUMNS, generate_ratings(
+            args.ratings, user_ids, user_weights, movie_ids, movie_weights, now, args.chunk
+        ))
+
+        print("Agregatlar qayta hisoblanmoqda...")
+        await reconcile(db)
+        print("Tayyor.")
+    finally:
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sintetik ma'lumotlar generatori (COPY)")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--movies", type=int, default=20_000)
+    parser.add_argument("--views", type=int, default=5_000_000)
+    parser.add_argument("--ratings", type=int, default=1_000_000)
+    parser.add_argument("--zipf", type=float, default=1.1, help="kinolar mashhurligi eksponentasi")
+    parser.add_argument("--user-zipf", type=float, default=0.8, help="foydalanuvchilar faolligi eksponentasi")
+    parser.add_argument("--chunk", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--truncate", action="store_true", help="oldingi sintetik ma'lumotlarni o'chirish")
+    asyncio.run(main(parser.parse_args()))
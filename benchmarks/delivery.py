@@ -0,0 +1,79 @@
+"""
+Kino yuborish hot-path benchmarki: eski 4 ta ketma-ket so'rov va get_movie_for_delivery.
+
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.delivery --requests 2000 --concurrency 20
+"""
+import argparse
+import asyncio
+import random
+
+from sqlalchemy import select
+
+from benchmarks.common import Timer, bench_database_url, format_summary
+from database import Database, Movie, MovieRating, MovieView
+
+
+async def legacy_delivery(db: Database, user_id: int, code: int):
+    """Oldingi send_movie_to_user ketma-ketligi (har biri alohida sessiya)"""
+    async with db.session_maker() as session:
+        movie = (await session.execute(
+            select(Movie).where(Movie.code == code, Movie.is_active == True)
+        )).scalars().first()
+    if not movie:
+        return
+    async with db.session_maker() as session:
+        session.add(MovieView(user_id=user_id, movie_id=movie.id))
+        locked = (await session.execute(select(Movie).where(Movie.id == movie.id))).scalars().first()
+        locked.views_count += 1
+        await session.commit()
+    await db.get_movie_rating(movie.id)
+    async with db.session_maker() as session:
+        (await session.execute(
+            select(MovieRating).where(MovieRating.user_id == user_id, MovieRating.movie_id == movie.id)
+        )).scalars().first()
+
+
+async def drive(fn, pairs, concurrency: int) -> Timer:
+    timer = Timer()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(user_id: int, code: int):
+        async with semaphore:
+            async with timer.measure():
+                await fn(user_id, code)
+
+    await asyncio.gather(*(one(user_id, code) for user_id, code in pairs))
+    return timer
+
+
+async def main(args: argparse.Namespace):
+    db = Database(bench_database_url())
+    await db.init_db()
+    db.view_buffer.start()
+    try:
+        user_ids = await db.get_user_ids_after(0, 1000)
+        codes = [m.code for m in await db.get_top_movies(200)]
+        if not user_ids or not codes:
+            raise SystemExit("Bazada foydalanuvchi/kino yo'q - avval test ma'lumotlari bilan to'ldiring")
+        pairs = [(random.choice(user_ids), random.choice(codes)) for _ in range(args.requests)]
+
+        legacy = await drive(lambda u, c: legacy_delivery(db, u, c), pairs, args.concurrency)
+        db.movie_cache.clear()
+        # Sovuq o'tish: har bir kod bir marta (takrorlar keshdan olinib natijani buzadi)
+        cold_pairs = [(random.choice(user_ids), code) for code in dict.fromkeys(codes)]
+        cold = await drive(db.get_movie_for_delivery, cold_pairs, args.concurrency)
+        warm = await drive(db.get_movie_for_delivery, pairs, args.concurrency)
+
+        print(format_summary("eski (4 so'rov)", legacy.samples))
+        print(format_summary("get_movie_for_delivery (sovuq)", cold.samples))
+        print(format_summary("get_movie_for_delivery (kesh)", warm.samples))
+    finally:
+        await db.view_buffer.stop()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Kino yuborish latency benchmarki")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
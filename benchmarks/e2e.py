@@ -0,0 +1,186 @@
+"""
+End-to-end benchmark: soxta Bot API server + dp.feed_update orqali sintetik yangilanishlar.
+
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.e2e --requests 2000 --concurrency 50
+    python -m benchmarks.e2e --scenarios code inline top --latency-ms 50 --rate-limit 0.01
+
+Har bir stsenariy uchun yangilanish/s va latency percentillari chiqariladi.
+Baza avval test ma'lumotlari bilan to'ldirilgan bo'lishi kerak.
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import random
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.common import Timer, bench_database_url, format_summary
+from benchmarks.fakeapi import FakeBotAPI
+
+_update_ids = itertools.count(1)
+
+
+def _user(user_id: int) -> dict:
+    return {"id": user_id, "is_bot": False, "first_name": "Bench", "username": f"u{user_id}"}
+
+
+def message_update(user_id: int, text: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "message": {
+            "message_id": random.randint(1, 10**6),
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": _user(user_id),
+            "text": text,
+        },
+    }
+
+
+def callback_update(user_id: int, data: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "callback_query": {
+            "id": str(next(_update_ids)),
+            "from": _user(user_id),
+            "chat_instance": "bench",
+            "data": data,
+            "message": {
+                "message_id": random.randint(1, 10**6),
+                "date": int(time.time()),
+                "chat": {"id": user_id, "type": "private"},
+                "text": "bench",
+            },
+        },
+    }
+
+
+def inline_update(user_id: int, query: str) -> dict:
+    return {
+        "update_id": next(_update_ids),
+        "inline_query": {"id": str(next(_update_ids)), "from": _user(user_id), "query": query, "offset": ""},
+    }
+
+
+def build_scenarios(codes: List[int], queries: List[str]) -> Dict[str, Callable[[int], List[dict]]]:
+    """Stsenariy -> foydalanuvchi uchun ketma-ket yuboriladigan yangilanishlar"""
+    return {
+        "code": lambda user_id: [message_update(user_id, str(random.choice(codes)))],
+        "deeplink": lambda user_id: [message_update(user_id, f"/start code_{random.choice(codes)}")],
+        "search": lambda user_id: [
+            message_update(user_id, "🔍 Qidirish"),
+            message_update(user_id, random.choice(queries)),
+        ],
+        "inline": lambda user_id: [inline_update(user_id, random.choice(queries))],
+        "rating": lambda user_id: [
+            callback_update(user_id, f"rating_{random.choice(codes)}_{random.randint(1, 5)}")
+        ],
+        "top": lambda user_id: [message_update(user_id, "/top")],
+        "stats": lambda user_id: [message_update(user_id, "/stats")],
+    }
+
+
+async def run_scenario(app, name: str, build: Callable[[int], List[dict]], user_ids: List[int], args) -> None:
+    timer = Timer()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    updates_count = 0
+
+    async def one():
+        nonlocal updates_count
+        updates = build(random.choice(user_ids))
+        updates_count += len(updates)
+        async with semaphore:
+            async with timer.measure():
+                for update in updates:
+                    await app.process_raw_update(update)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    print(format_summary(name, timer.samples))
+    print(f"{'':<32} {updates_count / elapsed:8.1f} yangilanish/s")
+
+
+async def run_broadcast(app, args) -> None:
+    from broadcast import BroadcastEngine
+
+    user_ids = await app.db.get_user_ids_after(0, args.broadcast_users)
+    engine = BroadcastEngine(
+        app.bot,
+        from_chat_id=app.config.ADMIN_ID or 1,
+        message_id=1,
+        rate=args.broadcast_rate
+    )
+    engine.start()
+    started = time.perf_counter()
+    try:
+        await engine.send_batch(user_ids)
+    finally:
+        await engine.stop()
+    elapsed = time.perf_counter() - started
+    stats = engine.stats
+    print(
+        f"{'broadcast':<32} n={len(user_ids):<6} {stats.processed / elapsed:8.1f} xabar/s "
+        f"(yuborildi {stats.sent}, xato {stats.failed}, bloklangan {stats.blocked})"
+    )
+
+
+async def main(args: argparse.Namespace):
+    db_url = bench_database_url()
+    api = FakeBotAPI(args.latency_ms / 1000, args.jitter_ms / 1000, args.rate_limit, args.retry_after)
+    api_url = await api.start(port=args.api_port)
+
+    # main.py import paytida config o'qiladi - muhit oldindan sozlanadi
+    os.environ["DATABASE_URL"] = db_url
+    os.environ["TELEGRAM_API_URL"] = api_url
+    os.environ["METRICS_PORT"] = "0"
+    os.environ.setdefault("BOT_TOKEN", "100000001:bench")
+    import main as app
+
+    app.setup_dispatcher()
+    app.throttling.limits = {}  # sintetik foydalanuvchilar anti-flood ga tushmasin
+    await app.db.init_db()
+    app.db.start_background_tasks()
+    app.movie_lists.start()
+    await app.bot.me()
+    try:
+        user_ids = await app.db.get_user_ids_after(0, 10000)
+        movies = await app.db.get_top_movies(200)
+        if not user_ids or not movies:
+            raise SystemExit("Bazada foydalanuvchi/kino yo'q - avval test ma'lumotlari bilan to'ldiring")
+        codes = [movie.code for movie in movies]
+        queries = [movie.title.split()[0][:6] for movie in movies]
+
+        scenarios = build_scenarios(codes, queries)
+        print(f"Bot API kechikishi {args.latency_ms}ms, 429 ehtimoli {args.rate_limit}, concurrency {args.concurrency}\n")
+        for name in args.scenarios:
+            if name == "broadcast":
+                await run_broadcast(app, args)
+            else:
+                await run_scenario(app, name, scenarios[name], user_ids, args)
+        print()
+        print(api.report())
+    finally:
+        await app.movie_lists.stop()
+        await app.db.stop_background_tasks()
+        await app.bot.session.close()
+        await app.db.engine.dispose()
+        await api.stop()
+
+
+if __name__ == "__main__":
+    all_scenarios = ["code", "deeplink", "search", "inline", "rating", "top", "stats", "broadcast"]
+    parser = argparse.ArgumentParser(description="End-to-end bot benchmarki (soxta Bot API bilan)")
+    parser.add_argument("--scenarios", nargs="+", choices=all_scenarios, default=all_scenarios)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--api-port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 ehtimoli (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--broadcast-users", type=int, default=2000)
+    parser.add_argument("--broadcast-rate", type=float, default=1000.0, help="xabar/s (token bucket)")
+    asyncio.run(main(parser.parse_args()))
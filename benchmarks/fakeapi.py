@@ -0,0 +1,138 @@
+"""
+Soxta Telegram Bot API server (lokal benchmarklar uchun).
+
+    python -m benchmarks.fakeapi --port 8081 --latency-ms 30 --rate-limit 0.01
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python main.py
+
+Har bir metodga sozlanadigan kechikish bilan soxta muvaffaqiyatli javob qaytaradi,
+berilgan ehtimollik bilan 429 (retry_after) ham qaytaradi.
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 100000001, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+
+# Muvaffaqiyatli javobi True bo'lgan metodlar
+TRUE_METHODS = {
+    "answercallbackquery", "answerinlinequery", "setmycommands", "deletewebhook",
+    "setwebhook", "deletemessage", "sendchataction",
+}
+
+
+class FakeBotAPI:
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, rate_limit: float = 0.0, retry_after: int = 1):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit = rate_limit  # 429 qaytarish ehtimoli
+        self.retry_after = retry_after
+        self.calls: Counter = Counter()
+        self.limited: Counter = Counter()
+        self._message_ids = itertools.count(1)
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_route("*", "/bot{token}/{method}", self.handle)
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        return dict(await request.post())
+
+    def _message(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = params.get("chat_id", 0)
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        return {
+            "message_id": next(self._message_ids),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text") or "",
+        }
+
+    def _result(self, method: str, params: Dict[str, Any]) -> Any:
+        if method in TRUE_METHODS:
+            return True
+        if method == "getme":
+            return BOT_USER
+        if method == "getchatmember":
+            user_id = int(params.get("user_id", 0))
+            return {"status": "member", "user": {"id": user_id, "is_bot": False, "first_name": "User"}}
+        if method == "getchat":
+            return {"id": int(params.get("chat_id", 0)), "type": "channel", "title": "Bench kanal"}
+        if method == "copymessage":
+            return {"message_id": next(self._message_ids)}
+        if method == "getupdates":
+            return []
+        # sendMessage, sendVideo, sendDocument, sendPhoto, editMessageText, ...
+        return self._message(params)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = await self._params(request)
+        self.calls[method] += 1
+
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if self.rate_limit and method not in ("getme", "getupdates") and random.random() < self.rate_limit:
+            self.limited[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+
+        return web.json_response({"ok": True, "result": self._result(method, params)})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8081) -> str:
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def report(self) -> str:
+        lines = [f"  {method:<24} {count:>8}  (429: {self.limited[method]})" for method, count in self.calls.most_common()]
+        return "Bot API chaqiruvlari:\n" + "\n".join(lines)
+
+
+async def main(args: argparse.Namespace):
+    api = FakeBotAPI(args.latency_ms / 1000, args.jitter_ms / 1000, args.rate_limit, args.retry_after)
+    url = await api.start(args.host, args.port)
+    print(f"Soxta Bot API: {url} (TELEGRAM_API_URL={url})")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+        print(api.report())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soxta Telegram Bot API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="429 ehtimoli (0..1)")
+    parser.add_argument("--retry-after", type=int, default=1)
+    try:
+        asyncio.run(main(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,87 @@
+"""
+Connection pool hajmini tanlash: turli pool_size larda sintetik parallel yuklama.
+
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.pool --sizes 5 10 20 40 --concurrency 100
+
+Har bir o'lcham uchun throughput, latency va pooldan ulanish kutish vaqti chiqariladi.
+Natijani jarayonlar soniga ko'paytirib Postgres max_connections bilan solishtiring.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+
+from benchmarks.common import Timer, bench_database_url, format_summary
+from database import Database
+
+
+async def workload(db: Database, user_ids, codes, queries):
+    """Keshsiz aralash yuklama (har bir amal alohida checkout)"""
+    choice = random.random()
+    if choice < 0.4:
+        await db.search_movies(random.choice(queries), limit=10)
+    elif choice < 0.7:
+        await db.get_user_stats(random.choice(user_ids))
+    else:
+        db.movie_cache.clear()
+        await db.get_movie_by_code(random.choice(codes))
+
+
+async def run_size(url: str, size: int, args: argparse.Namespace, user_ids, codes, queries):
+    db = Database(url, pool_size=size, max_overflow=0)
+    try:
+        # Ulanishlarni oldindan ochish - o'lchovga connect vaqti kirmasin
+        await asyncio.gather(*(db.ping() for _ in range(size)))
+        db.profiler.reset()
+
+        timer = Timer()
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with semaphore:
+                async with timer.measure():
+                    await workload(db, user_ids, codes, queries)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(args.requests)))
+        elapsed = time.perf_counter() - started
+
+        pool_wait = sum(stats.pool_wait for stats in db.profiler.stats.values())
+        print(format_summary(f"pool_size={size}", timer.samples))
+        print(
+            f"{'':<32} {args.requests / elapsed:8.1f} amal/s, "
+            f"o'rtacha pool kutish {pool_wait / args.requests * 1000:.2f}ms"
+        )
+    finally:
+        await db.engine.dispose()
+
+
+async def main(args: argparse.Namespace):
+    url = bench_database_url()
+    db = Database(url)
+    await db.init_db()
+    try:
+        user_ids = await db.get_user_ids_after(0, 1000)
+        movies = await db.get_top_movies(200)
+        if not user_ids or not movies:
+            raise SystemExit("Bazada foydalanuvchi/kino yo'q - avval test ma'lumotlari bilan to'ldiring")
+        codes = [movie.code for movie in movies]
+        queries = [movie.title.split()[0][:5] for movie in movies]
+        async with db.engine.connect() as conn:
+            max_connections = (await conn.execute(text("SHOW max_connections"))).scalar_one()
+    finally:
+        await db.engine.dispose()
+
+    print(f"Postgres max_connections = {max_connections}, concurrency = {args.concurrency}\n")
+    for size in args.sizes:
+        await run_size(url, size, args, user_ids, codes, queries)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Connection pool o'lchamlari benchmarki")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5, 10, 20, 40])
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,56 @@
+"""
+Yozib olingan yangilanishlarni webhook serverga POST qilish (lokal test).
+
+    RUN_MODE=webhook WEBHOOK_SECRET=test python main.py
+    WEBHOOK_SECRET=test python -m benchmarks.replay updates.jsonl --url http://127.0.0.1:8080/webhook --concurrency 50
+
+updates.jsonl - har qatorda bitta Telegram Update JSON.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+
+import aiohttp
+
+from benchmarks.common import format_summary
+from config import config
+
+
+async def main(args: argparse.Namespace):
+    with open(args.file, encoding="utf-8") as f:
+        updates = [json.loads(line) for line in f if line.strip()]
+    # Har takror uchun alohida nusxa - update_id har biriga o'zicha yoziladi
+    updates = [dict(update) for _ in range(args.repeat) for update in updates]
+    for update_id, update in enumerate(updates, 1):
+        update["update_id"] = update_id
+
+    headers = {"X-Telegram-Bot-Api-Secret-Token": config.WEBHOOK_SECRET} if config.WEBHOOK_SECRET else {}
+    statuses = Counter()
+    samples = []
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async with aiohttp.ClientSession(headers=headers) as session:
+        async def post(update: dict):
+            async with semaphore:
+                started = time.perf_counter()
+                async with session.post(args.url, json=update) as response:
+                    statuses[response.status] += 1
+                samples.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(post(update) for update in updates))
+        elapsed = time.perf_counter() - started
+
+    print(format_summary("webhook javobi", samples))
+    print(f"{len(updates) / elapsed:.1f} so'rov/s | statuslar: {dict(statuses)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webhookga yangilanishlarni qayta yuborish")
+    parser.add_argument("file")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{config.WEBHOOK_PORT}{config.WEBHOOK_PATH}")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,103 @@
+"""
+Qidiruv benchmarki: eski ILIKE '%q%' (seq scan) va yangi full-text + trigram qidiruv.
+
+    BENCH_DATABASE_URL=postgresql+asyncpg://... python -m benchmarks.search --sizes 10000 100000
+"""
+import argparse
+import asyncio
+import random
+
+from sqlalchemy import delete, insert, select, text
+
+from benchmarks.common import Timer, bench_database_url, format_summary
+from database import Database, Movie
+
+CODE_OFFSET = 900_000_000  # benchmark kinolari shu koddan boshlanadi
+
+WORDS = [
+    "avatar", "qasoskorlar", "yulduzlar", "urushi", "sehrgar", "qirol", "sher", "tun",
+    "shahar", "sirli", "orol", "qaytish", "oxirgi", "jangchi", "muz", "olov", "dengiz",
+    "qaroqchilar", "kosmos", "robot", "detektiv", "sevgi", "hikoyasi", "yo'l", "tog'",
+    "matrix", "inception", "interstellar", "gladiator", "titanic", "joker", "batman",
+]
+GENRES = ["Drama", "Komediya", "Jangari", "Romantik", "Qo'rqinchli", "Fantastika", "Sarguzasht", "Thriller"]
+QUERIES = ["avatar", "qirol sher", "jangari", "sirli orol", "matrx", "inter", "dengiz qaroqchilari", "kosmos"]
+
+
+def legacy_search_stmt(query: str, limit: int = 10):
+    pattern = f"%{query}%"
+    return (
+        select(Movie)
+        .where(Movie.is_active == True, Movie.title.ilike(pattern) | Movie.genre.ilike(pattern))
+        .order_by(Movie.views_count.desc())
+        .limit(limit)
+    )
+
+
+async def seed(db: Database, size: int):
+    """Benchmark kinolarini size tagacha to'ldirish"""
+    async with db.session_maker() as session:
+        existing = (await session.execute(
+            select(Movie.code).where(Movie.code >= CODE_OFFSET).order_by(Movie.code.desc()).limit(1)
+        )).scalar()
+        start = (existing - CODE_OFFSET + 1) if existing else 0
+        batch = []
+        for i in range(start, size):
+            batch.append({
+                'code': CODE_OFFSET + i,
+                'file_id': f"bench_{i}",
+                'title': " ".join(random.sample(WORDS, random.randint(1, 4))).title(),
+                'genre': ", ".join(random.sample(GENRES, random.randint(1, 2))),
+                'views_count': int(random.paretovariate(1.2)),
+            })
+            if len(batch) == 5000:
+                await session.execute(insert(Movie), batch)
+                batch = []
+        if batch:
+            await session.execute(insert(Movie), batch)
+        await session.commit()
+        await session.execute(text("ANALYZE movies"))
+        await session.commit()
+
+
+async def run_queries(db: Database, rounds: int):
+    legacy, indexed = Timer(), Timer()
+    for _ in range(rounds):
+        for query in QUERIES:
+            async with db.session_maker() as session:
+                # Indekssiz eski rejani takrorlash
+                await session.execute(text("SET LOCAL enable_bitmapscan = off"))
+                async with legacy.measure():
+                    (await session.execute(legacy_search_stmt(query))).scalars().all()
+            async with indexed.measure():
+                await db.search_movies(query)
+    return legacy, indexed
+
+
+async def main(args: argparse.Namespace):
+    db = Database(bench_database_url())
+    await db.init_db()
+    try:
+        if not db.search_indexed:
+            raise SystemExit("pg_trgm mavjud emas - benchmark ma'nosiz")
+        for size in sorted(args.sizes):
+            await seed(db, size)
+            await run_queries(db, 1)  # isitish
+            legacy, indexed = await run_queries(db, args.rounds)
+            print(f"--- {size} ta kino ---")
+            print(format_summary("ILIKE '%q%' (eski)", legacy.samples))
+            print(format_summary("full-text + trigram", indexed.samples))
+    finally:
+        if not args.keep:
+            async with db.session_maker() as session:
+                await session.execute(delete(Movie).where(Movie.code >= CODE_OFFSET))
+                await session.commit()
+        await db.engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Qidiruv latency benchmarki")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--keep", action="store_true", help="Benchmark kinolarini o'chirmaslik")
+    asyncio.run(main(parser.parse_args()))
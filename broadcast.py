@@ -0,0 +1,282 @@
+import asyncio
+import functools
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Optional, Sequence, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramForbiddenError, TelegramRetryAfter
+
+from config import config
+from database import Database, BroadcastJob
+from ratelimit import TokenBucket
+from utils import create_progress_bar
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+
+# Ishlayotgan rassilka tasklari (GC yig'ib olmasligi uchun)
+_running_jobs: Set[asyncio.Task] = set()
+
+
+@dataclass
+class BroadcastStats:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0
+    resumed_from: int = 0  # qayta tiklanganda oldin ishlanganlar soni
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def processed(self) -> int:
+        return self.sent + self.failed + self.blocked
+
+    @property
+    def throughput(self) -> float:
+        """Xabar/soniya"""
+        elapsed = time.monotonic() - self.started_at
+        return (self.processed - self.resumed_from) / elapsed if elapsed > 0 else 0.0
+
+
+def format_broadcast_progress(stats: BroadcastStats) -> str:
+    """Rassilka progress matni"""
+    # Rassilka davomida qo'shilgan foydalanuvchilar ham yuboriladi
+    total = max(stats.total, stats.processed)
+    return (
+        f"📤 Rassilka davom etmoqda...\n\n"
+        f"{create_progress_bar(stats.processed, total)}\n"
+        f"{stats.processed} / {total}\n"
+        f"⚡ {stats.throughput:.1f} xabar/s"
+    )
+
+
+def format_broadcast_result(stats: BroadcastStats) -> str:
+    """Rassilka yakuniy natijasi"""
+    return (
+        f"✅ <b>Rassilka yakunlandi!</b>\n\n"
+        f"📊 Natijalar:\n"
+        f"✅ Yuborildi: {stats.sent}\n"
+        f"🚫 Bloklangan: {stats.blocked}\n"
+        f"❌ Xatolik: {stats.failed}\n"
+        f"📊 Jami: {stats.total}\n"
+        f"⚡ Tezlik: {stats.throughput:.1f} xabar/s"
+    )
+
+
+class BroadcastEngine:
+    """Worker pool va token bucket asosidagi rassilka"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        from_chat_id: int,
+        message_id: int,
+        rate: float = None,
+        workers: int = None,
+        stats: BroadcastStats = None,
+        on_progress: Optional[Callable[[BroadcastStats], Awaitable[None]]] = None,
+        progress_interval: float = 3.0
+    ):
+        self.bot = bot
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        self.rate = rate or 1 / config.MAX_BROADCAST_RATE
+        self.workers = workers or config.BROADCAST_WORKERS
+        self.bucket = TokenBucket(self.rate, capacity=self.workers)
+        self.stats = stats or BroadcastStats()
+        self.on_progress = on_progress
+        self.progress_interval = progress_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=self.workers * 2)
+        self._tasks = []
+        self._last_progress = 0.0
+
+    def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def send_batch(self, user_ids: Sequence[int]):
+        """Batchni yuborish va to'liq tugashini kutish"""
+        for user_id in user_ids:
+            await self._queue.put(user_id)
+        await self._queue.join()
+
+    async def _worker(self):
+        while True:
+            user_id = await self._queue.get()
+            try:
+                await self._send(user_id)
+                await self.report()
+            except Exception as e:
+                logger.error(f"Rassilka workerida xatolik: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _send(self, user_id: int):
+        for _ in range(MAX_RETRIES):
+            await self.bucket.acquire()
+            try:
+                await self.bot.copy_message(
+                    chat_id=user_id,
+                    from_chat_id=self.from_chat_id,
+                    message_id=self.message_id
+                )
+                self.stats.sent += 1
+                return
+            except TelegramRetryAfter as e:
+                # Foydalanuvchi xato emas - butun bucket kutadi
+                logger.warning(f"Flood limit: {e.retry_after}s kutilmoqda")
+                self.bucket.pause(e.retry_after)
+            except TelegramForbiddenError:
+                self.stats.blocked += 1
+                return
+            except Exception:
+                self.stats.failed += 1
+                return
+        self.stats.failed += 1
+
+    async def report(self, force: bool = False):
+        if not self.on_progress:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_progress < self.progress_interval:
+            return
+        self._last_progress = now
+        try:
+            await self.on_progress(self.stats)
+        except Exception:
+            pass
+
+
+async def run_broadcast_job(bot: Bot, db: Database, job: BroadcastJob) -> Optional[BroadcastStats]:
+    """
+    Rassilka jobini bajarish.
+    Job advisory lock bilan egallanadi - bir nechta replika/worker bir jobni
+    ikki marta yubormaydi. Lock olinmasa (boshqa jarayon yubormoqda) None qaytadi.
+    """
+    async with db.broadcast_job_lock(job.id) as locked:
+        if not locked:
+            logger.info(f"Rassilka #{job.id} boshqa jarayonda bajarilmoqda, o'tkazib yuborildi")
+            return None
+        # Lock kutilgan paytda boshqa jarayon davom ettirgan bo'lishi mumkin - checkpoint qayta o'qiladi
+        job = await db.get_broadcast_job(job.id)
+        if job is None or job.status != "running":
+            return None
+        return await _run_locked_job(bot, db, job)
+
+
+async def _run_locked_job(bot: Bot, db: Database, job: BroadcastJob) -> BroadcastStats:
+    """
+    Foydalanuvchilar keyset pagination bilan o'qiladi, har batchdan keyin
+    checkpoint saqlanadi. Qayta tiklanganda oxirgi batch qayta yuborilishi mumkin.
+    """
+    stats = BroadcastStats(
+        total=job.total,
+        sent=job.sent,
+        failed=job.failed,
+        blocked=job.blocked,
+        resumed_from=job.sent + job.failed + job.blocked
+    )
+
+    async def on_progress(stats: BroadcastStats):
+        if job.progress_chat_id and job.progress_message_id:
+            await bot.edit_message_text(
+                format_broadcast_progress(stats),
+                chat_id=job.progress_chat_id,
+                message_id=job.progress_message_id
+            )
+
+    engine = BroadcastEngine(
+        bot,
+        from_chat_id=job.from_chat_id,
+        message_id=job.message_id,
+        stats=stats,
+        on_progress=on_progress
+    )
+    engine.start()
+    last_user_id = job.last_user_id
+    try:
+        while True:
+            user_ids = await db.get_user_ids_after(last_user_id, config.BROADCAST_BATCH_SIZE)
+            if not user_ids:
+                break
+            await engine.send_batch(user_ids)
+            last_user_id = user_ids[-1]
+            stats.total = max(stats.total, stats.processed)
+            await db.update_broadcast_job(
+                job.id,
+                last_user_id=last_user_id,
+                sent=stats.sent,
+                failed=stats.failed,
+                blocked=stats.blocked
+            )
+    finally:
+        await engine.stop()
+
+    await db.update_broadcast_job(job.id, status="done", finished_at=datetime.utcnow())
+
+    if job.progress_chat_id and job.progress_message_id:
+        try:
+            await bot.edit_message_text(
+                format_broadcast_result(stats),
+                chat_id=job.progress_chat_id,
+                message_id=job.progress_message_id,
+                parse_mode="HTML"
+            )
+        except Exception:
+            pass
+
+    logger.info(f"Rassilka #{job.id} yakunlandi: {stats.sent}/{stats.total}")
+    return stats
+
+
+async def _mark_job_failed(bot: Bot, db: Database, job: BroadcastJob, error: BaseException):
+    """Xatolik bilan to'xtagan jobni belgilash va adminga xabar berish"""
+    try:
+        await db.update_broadcast_job(job.id, status="failed", finished_at=datetime.utcnow())
+    except Exception as e:
+        logger.error(f"Rassilka #{job.id} holatini saqlab bo'lmadi: {e}")
+    if job.progress_chat_id:
+        try:
+            await bot.send_message(
+                job.progress_chat_id,
+                f"❌ Rassilka #{job.id} xatolik bilan to'xtadi: {error}"
+            )
+        except Exception:
+            pass
+
+
+def _on_job_done(bot: Bot, db: Database, job: BroadcastJob, task: asyncio.Task):
+    _running_jobs.discard(task)
+    # Bekor qilish (bot to'xtashi) xato emas - job keyingi ishga tushishda davom etadi
+    if task.cancelled() or task.exception() is None:
+        return
+    error = task.exception()
+    logger.error(f"Rassilka #{job.id} xatolik bilan to'xtadi", exc_info=error)
+    follow_up = asyncio.create_task(_mark_job_failed(bot, db, job, error))
+    _running_jobs.add(follow_up)
+    follow_up.add_done_callback(_running_jobs.discard)
+
+
+def start_broadcast_job(bot: Bot, db: Database, job: BroadcastJob) -> asyncio.Task:
+    """Jobni fon taskida ishga tushirish"""
+    task = asyncio.create_task(run_broadcast_job(bot, db, job))
+    _running_jobs.add(task)
+    task.add_done_callback(functools.partial(_on_job_done, bot, db, job))
+    return task
+
+
+async def resume_broadcast_jobs(bot: Bot, db: Database):
+    """Tugallanmagan rassilkalarni qayta ishga tushirish"""
+    jobs = await db.get_unfinished_broadcast_jobs()
+    for job in jobs:
+        logger.info(f"Rassilka #{job.id} davom ettirilmoqda (user_id > {job.last_user_id})")
+        start_broadcast_job(bot, db, job)
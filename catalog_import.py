@@ -0,0 +1,167 @@
+"""
+Katalogni CSV/JSON fayldan import qilish: oqimli o'qish va qatorlarni tekshirish.
+
+CSV sarlavhasi (yoki JSON obyekt kalitlari):
+    code, file_id, title, genre, description, year, country, duration,
+    quality, imdb_rating, thumbnail_file_id, media_type
+
+JSON: obyektlar massivi yoki har qatorda bitta obyekt (JSON Lines).
+"""
+import csv
+import io
+import itertools
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import IO, Iterator, List, Optional, Tuple
+
+from database import MEDIA_VIDEO, MEDIA_DOCUMENT
+
+FIELDS = (
+    "code", "file_id", "title", "genre", "description", "year", "country", "duration",
+    "quality", "imdb_rating", "thumbnail_file_id", "media_type",
+)
+REQUIRED_FIELDS = ("code", "file_id", "title", "genre")
+MAX_ERRORS = 10  # hisobotda ko'rsatiladigan xatolar soni
+MAX_CODE = 2 ** 63 - 1  # movies.code BIGINT
+
+_CHUNK_SIZE = 64 * 1024
+_decoder = json.JSONDecoder()
+
+
+class CatalogImportError(ValueError):
+    """Faylni umuman o'qib bo'lmadi"""
+
+
+@dataclass
+class ImportReport:
+    total: int = 0
+    inserted: int = 0
+    duplicates: int = 0  # fayl ichida takrorlangan kod
+    existing: int = 0  # bazada allaqachon bor kod
+    invalid: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def add_error(self, line: int, message: str):
+        self.invalid += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{line}: {message}")
+
+
+def _text_stream(stream: IO[bytes]) -> io.TextIOWrapper:
+    # utf-8-sig: Excel saqlagan CSV boshidagi BOM olib tashlanadi
+    return io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+
+
+def _iter_csv(stream: IO[bytes]) -> Iterator[Tuple[int, dict]]:
+    reader = csv.DictReader(_text_stream(stream))
+    if not reader.fieldnames or "code" not in [name.strip() for name in reader.fieldnames]:
+        raise CatalogImportError("CSV sarlavhasida 'code' ustuni yo'q")
+    for row in reader:
+        yield reader.line_num, {(key or "").strip(): value for key, value in row.items()}
+
+
+def _iter_json_lines(lines: Iterator[str]) -> Iterator[Tuple[int, dict]]:
+    for line_no, line in enumerate(lines, 1):
+        if line.strip():
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as e:
+                raise CatalogImportError(f"{line_no}-qatorda JSON xatosi: {e.msg}")
+
+
+def _iter_json_array(text: IO[str], buffer: str) -> Iterator[Tuple[int, dict]]:
+    """Massiv elementlarini butun faylni xotiraga yuklamasdan o'qish"""
+    pos = 0
+    index = 0
+    eof = False
+    while True:
+        # Ajratuvchilar va bo'shliqlarni o'tkazish
+        while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buffer) and buffer[pos] == "]":
+            return
+        try:
+            if pos == len(buffer):
+                raise json.JSONDecodeError("ma'lumot tugadi", buffer, pos)
+            item, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as e:
+            if eof:
+                raise CatalogImportError(f"{index + 1}-elementda JSON xatosi: {e.msg}")
+            # Element chunk chegarasida bo'linib qolgan - keyingi chunkni qo'shish
+            chunk = text.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        index += 1
+        yield index, item
+        pos = end
+
+
+def iter_rows(stream: IO[bytes], filename: str) -> Iterator[Tuple[int, dict]]:
+    """(qator/element raqami, xom qiymatlar) juftliklari"""
+    if filename.lower().endswith(".csv"):
+        yield from _iter_csv(stream)
+        return
+
+    text = _text_stream(stream)
+    buffer = text.read(_CHUNK_SIZE)
+    head = buffer.lstrip()[:1]
+    if head == "[":
+        yield from _iter_json_array(text, buffer.lstrip()[1:])
+    elif head == "{":
+        # Birinchi chunk oxiridagi qator davomini qo'shib, qolganini oqimdan o'qish
+        first = io.StringIO(buffer + text.readline())
+        yield from _iter_json_lines(itertools.chain(first, text))
+    elif head:
+        raise CatalogImportError("Fayl formati noma'lum (CSV, JSON yoki JSON Lines kutilgan)")
+
+
+def _optional_str(value) -> Optional[str]:
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _optional_number(value, cast, name: str, low: float, high: float):
+    value = _optional_str(value)
+    if value is None:
+        return None
+    try:
+        number = cast(value)
+    except ValueError:
+        raise ValueError(f"{name} raqam bo'lishi kerak")
+    if not low <= number <= high:
+        raise ValueError(f"{name} {low}..{high} oralig'ida bo'lishi kerak")
+    return number
+
+
+def validate_row(raw: dict) -> dict:
+    """Xom qiymatlarni Movie ustunlariga aylantirish (xato bo'lsa ValueError)"""
+    if not isinstance(raw, dict):
+        raise ValueError("obyekt kutilgan")
+
+    values = {name: _optional_str(raw.get(name)) for name in FIELDS}
+    for name in REQUIRED_FIELDS:
+        if values[name] is None:
+            raise ValueError(f"'{name}' majburiy")
+
+    code = values["code"]
+    if not code.isdigit() or int(code) <= 0:
+        raise ValueError("kod musbat butun son bo'lishi kerak")
+    if int(code) > MAX_CODE:
+        raise ValueError("kod juda katta")
+    if len(values["title"]) < 2:
+        raise ValueError("kino nomi juda qisqa")
+    if len(values["genre"]) < 2:
+        raise ValueError("janr noto'g'ri")
+    if values["media_type"] not in (None, MEDIA_VIDEO, MEDIA_DOCUMENT):
+        raise ValueError(f"media_type {MEDIA_VIDEO} yoki {MEDIA_DOCUMENT} bo'lishi kerak")
+
+    values["code"] = int(code)
+    values["year"] = _optional_number(values["year"], int, "yil", 1900, datetime.now().year + 5)
+    values["duration"] = _optional_number(values["duration"], int, "davomiylik", 1, 500)
+    values["imdb_rating"] = _optional_number(values["imdb_rating"], float, "IMDb reytingi", 0, 10)
+    values["quality"] = values["quality"] or "HD"
+    return values
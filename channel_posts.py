@@ -0,0 +1,84 @@
+import asyncio
+import logging
+from typing import Optional, Sequence, Set
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.utils.keyboard import InlineKeyboardBuilder
+
+from config import config
+from database import Movie
+from ratelimit import TokenBucket
+from utils import format_movie_info
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRIES = 5
+
+# Navbatdagi post tasklari (GC yig'ib olmasligi uchun)
+_running_posts: Set[asyncio.Task] = set()
+
+
+async def post_movie_to_channel(bot: Bot, movie: Movie):
+    """Kino haqida kanalga post (xatolik chaqiruvchiga uzatiladi)"""
+    bot_info = await bot.me()
+    post_text = format_movie_info(movie, movie.rating_summary)
+    post_text += f"\n\n👇 Kinoni olish uchun botga o'ting:"
+
+    kb = InlineKeyboardBuilder()
+    kb.button(text="🎬 Kinoni olish", url=f"https://t.me/{bot_info.username}?start=code_{movie.code}")
+
+    if movie.thumbnail_file_id:
+        await bot.send_photo(
+            chat_id=config.CHANNEL_USERNAME,
+            photo=movie.thumbnail_file_id,
+            caption=post_text,
+            reply_markup=kb.as_markup(),
+            parse_mode="HTML"
+        )
+    else:
+        await bot.send_message(
+            chat_id=config.CHANNEL_USERNAME,
+            text=post_text,
+            reply_markup=kb.as_markup(),
+            parse_mode="HTML"
+        )
+
+
+async def _post_all(bot: Bot, movies: Sequence[Movie], notify_chat_id: Optional[int]):
+    # Kanalga yozish limiti (~20 xabar/daqiqa)
+    bucket = TokenBucket(1 / config.CHANNEL_POST_INTERVAL, capacity=1)
+    posted = failed = 0
+    for movie in movies:
+        for _ in range(MAX_RETRIES):
+            await bucket.acquire()
+            try:
+                await post_movie_to_channel(bot, movie)
+                posted += 1
+                break
+            except TelegramRetryAfter as e:
+                bucket.pause(e.retry_after)
+            except Exception as e:
+                logger.error(f"Kanalga yuborishda xatolik (kod {movie.code}): {e}")
+                failed += 1
+                break
+        else:
+            failed += 1
+
+    logger.info(f"Kanal postlari yakunlandi: {posted} ta, xatolik: {failed}")
+    if notify_chat_id:
+        try:
+            await bot.send_message(
+                notify_chat_id,
+                f"📢 Kanal postlari yakunlandi!\n\n✅ Joylandi: {posted}\n❌ Xatolik: {failed}"
+            )
+        except Exception:
+            pass
+
+
+def queue_channel_posts(bot: Bot, movies: Sequence[Movie], notify_chat_id: Optional[int] = None) -> asyncio.Task:
+    """Kinolarni fon taskida, kanal limitiga rioya qilib joylash"""
+    task = asyncio.create_task(_post_all(bot, list(movies), notify_chat_id))
+    _running_posts.add(task)
+    task.add_done_callback(_running_posts.discard)
+    return task
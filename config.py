@@ -1,5 +1,5 @@
 import os
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -9,9 +9,42 @@ class Config:
     # Bot
     BOT_TOKEN: str = os.getenv("BOT_TOKEN")
     ADMIN_ID: int = int(os.getenv("ADMIN_ID", 0))
+    # Lokal Bot API server (yoki benchmarklar uchun soxta server); bo'sh - api.telegram.org
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL")
     
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL")
+    # Pool hajmi x jarayonlar soni Postgres max_connections dan kam bo'lishi kerak
+    # (benchmarks/pool.py bilan o'lchang)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 10))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE: int = 3600
+    # asyncpg prepared statement keshi; pgbouncer (transaction mode) uchun 0
+    DB_STATEMENT_CACHE_SIZE: int = int(os.getenv("DB_STATEMENT_CACHE_SIZE", 100))
+    DB_HEALTH_CHECK_INTERVAL: int = 30  # pool_pre_ping o'rniga fon tekshiruvi
+    DB_HEALTH_CHECK_TIMEOUT: float = 5  # alohida ulanish bilan tekshiruv muddati
+    
+    # Ishga tushirish rejimi: "polling" yoki "webhook"
+    RUN_MODE: str = os.getenv("RUN_MODE", "polling")
+    WEBHOOK_URL: str = os.getenv("WEBHOOK_URL")  # bo'sh bo'lsa setWebhook chaqirilmaydi (lokal test)
+    WEBHOOK_PATH: str = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_HOST: str = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", 8080))
+    WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET")  # webhook rejimida majburiy
+    WEBHOOK_MAX_IN_FLIGHT: int = 64  # bir vaqtda qayta ishlanadigan yangilanishlar
+    WEBHOOK_QUEUE_SIZE: int = 2000
+    
+    # Ko'p jarayonli rejim (1 - bitta jarayon)
+    WORKER_PROCESSES: int = int(os.getenv("WORKER_PROCESSES", 1))
+    WORKER_MAX_IN_FLIGHT: int = 64
+    WORKER_QUEUE_SIZE: int = 1000  # har bir worker navbati (to'lsa qabul qilish kutadi)
+    
+    # FSM storage: "memory" yoki "postgres" (bir nechta replika uchun)
+    FSM_STORAGE: str = os.getenv("FSM_STORAGE", "memory")
+    FSM_STATE_TTL: int = 86400  # tashlab ketilgan holatlar shu vaqtdan keyin o'chadi
+    FSM_CACHE_TTL: int = 0  # 0 - keshsiz (replikalar orasida har doim aniq)
+    FSM_CACHE_SIZE: int = 10000
     
     # Channel
     CHANNEL_USERNAME: str = os.getenv("CHANNEL_USERNAME")
@@ -22,11 +55,51 @@ class Config:
     ENABLE_RATINGS: bool = True
     ENABLE_SEARCH: bool = True
     CACHE_TTL: int = 3600
+    SUBSCRIPTION_CACHE_SIZE: int = 50000
+    MOVIE_CACHE_SIZE: int = 5000
+    MOVIE_STATS_TTL: int = 30  # keshdagi kino reyting/ko'rishlari shu vaqtdan keyin bazadan yangilanadi
+    SUBSCRIPTION_NEGATIVE_TTL: int = 10
+    SUBSCRIPTION_CHECK_TIMEOUT: float = 3.0
+    INLINE_CACHE_SIZE: int = 5000
+    INLINE_CACHE_TTL: int = 300
+    
+    # Ko'rishlar buferi
+    VIEW_FLUSH_INTERVAL_MS: int = 1000
+    VIEW_FLUSH_MAX_EVENTS: int = 500
+    
+    # Metrikalar (/metrics va /ready); 0 - o'chirilgan (standart)
+    # Ko'p jarayonli rejimda worker i METRICS_PORT + 1 + i portida
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "127.0.0.1")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", 0))
+    
+    # Sekin so'rovlar profileri
+    SLOW_QUERY_MS: int = int(os.getenv("SLOW_QUERY_MS", 200))
+    SLOW_QUERY_EXPLAIN: bool = True  # sekin so'rov rejasini fonda EXPLAIN bilan olish
+    PROFILER_MAX_STATEMENTS: int = 500
+    
+    # Statistika
+    STATS_REFRESH_INTERVAL: int = 300
+    
+    # Anti-flood: yangilanish turi -> (soniyasiga token, burst)
+    THROTTLE_LIMITS: dict = field(default_factory=lambda: {
+        "message": (1.0, 5),
+        "callback_query": (2.0, 8),
+        "inline_query": (3.0, 10),
+    })
+    THROTTLE_CACHE_SIZE: int = 100000
+    THROTTLE_IDLE_TTL: int = 600  # shuncha vaqt faol bo'lmagan foydalanuvchi unutiladi
     
     # Limits
-    MAX_BROADCAST_RATE: float = 0.03
+    MAX_BROADCAST_RATE: float = 0.03  # xabarlar orasidagi o'rtacha interval (s)
+    BROADCAST_WORKERS: int = 10
+    BROADCAST_BATCH_SIZE: int = 500  # checkpoint oralig'i
     MAX_MOVIE_SIZE_MB: int = 2000
     
+    # Katalog importi (CSV/JSON)
+    IMPORT_MAX_FILE_MB: int = 20  # Bot API getFile chegarasi
+    IMPORT_BATCH_SIZE: int = 500
+    CHANNEL_POST_INTERVAL: float = 3.0  # kanal postlari orasidagi interval (s)
+    
     # Messages
     WELCOME_MESSAGE: str = "🎬 Xush kelibsiz! Premium kino botiga marhamat!"
     
@@ -1,16 +1,39 @@
-from typing import Optional, Sequence, List, Tuple
+import asyncio
+import base64
+import json
+import re
+import uuid
+import asyncpg
+from collections import Counter
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional, Sequence, List, Tuple, Set
 from datetime import datetime, timedelta
-from sqlalchemy import BigInteger, String, select, delete, func, Integer, Float, DateTime, Text, Index, ForeignKey
+from sqlalchemy import (
+    BigInteger, String, select, insert, delete, update, func, text, values, column, literal, literal_column,
+    Integer, Float, DateTime, Text, Index, ForeignKey, any_, bindparam
+)
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
-from sqlalchemy.dialects.postgresql import insert as pg_insert 
+from sqlalchemy.dialects.postgresql import insert as pg_insert, ARRAY, JSONB
 import logging
 
+from cache import TTLCache
+from config import config
+from metrics import InstrumentedPool
+from profiler import QueryProfiler
+
 logger = logging.getLogger(__name__)
 
 class Base(DeclarativeBase):
     pass
 
+def rating_tuple(rating_sum: Optional[int], rating_count: Optional[int]) -> Tuple[float, int]:
+    """Agregatdan (o'rtacha baho, baholar soni) yasash"""
+    if not rating_count:
+        return (0.0, 0)
+    return (round(rating_sum / rating_count, 1), rating_count)
+
 class User(Base):
     __tablename__ = "users"
     id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=False)
@@ -45,7 +68,11 @@ class Movie(Base):
     quality: Mapped[str] = mapped_column(String, default="HD")
     imdb_rating: Mapped[Optional[float]] = mapped_column(Float)
     thumbnail_file_id: Mapped[Optional[str]] = mapped_column(String)
+    media_type: Mapped[Optional[str]] = mapped_column(String)  # video / document, None - noma'lum
+    version: Mapped[int] = mapped_column(Integer, default=1, server_default="1")  # caption keshi uchun
     views_count: Mapped[int] = mapped_column(Integer, default=0)
+    rating_sum: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     is_active: Mapped[bool] = mapped_column(default=True)
     added_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     
@@ -53,6 +80,11 @@ class Movie(Base):
     views = relationship("MovieView", back_populates="movie", cascade="all, delete-orphan")
     ratings = relationship("MovieRating", back_populates="movie", cascade="all, delete-orphan")
 
+    @property
+    def rating_summary(self) -> Tuple[float, int]:
+        """(o'rtacha baho, baholar soni) - movie_ratings ga so'rovsiz"""
+        return rating_tuple(self.rating_sum, self.rating_count)
+
 class RequiredChannel(Base):
     __tablename__ = "required_channels"
     id: Mapped[int] = mapped_column(primary_key=True)
@@ -60,6 +92,8 @@ class RequiredChannel(Base):
     title: Mapped[str] = mapped_column(String)
     priority: Mapped[int] = mapped_column(Integer, default=0)
     is_active: Mapped[bool] = mapped_column(default=True)
+    username: Mapped[Optional[str]] = mapped_column(String)
+    invite_link: Mapped[Optional[str]] = mapped_column(String)
 
 class MovieView(Base):
     __tablename__ = "movie_views"
@@ -94,25 +128,409 @@ class MovieRating(Base):
     user = relationship("User", back_populates="ratings")
     movie = relationship("Movie", back_populates="ratings")
 
+class BroadcastJob(Base):
+    __tablename__ = "broadcast_jobs"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    from_chat_id: Mapped[int] = mapped_column(BigInteger)
+    message_id: Mapped[int] = mapped_column(BigInteger)
+    status: Mapped[str] = mapped_column(String, default="running")  # running / done / failed
+    last_user_id: Mapped[int] = mapped_column(BigInteger, default=0)  # checkpoint
+    total: Mapped[int] = mapped_column(Integer, default=0)
+    sent: Mapped[int] = mapped_column(Integer, default=0)
+    failed: Mapped[int] = mapped_column(Integer, default=0)
+    blocked: Mapped[int] = mapped_column(Integer, default=0)
+    progress_chat_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    progress_message_id: Mapped[Optional[int]] = mapped_column(BigInteger)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime)
+
+class FSMRecord(Base):
+    __tablename__ = "fsm_states"
+    __table_args__ = (
+        Index('idx_fsm_updated_at', 'updated_at'),
+    )
+    
+    key: Mapped[str] = mapped_column(String, primary_key=True)
+    state: Mapped[Optional[str]] = mapped_column(String)
+    data: Mapped[Optional[dict]] = mapped_column(JSONB)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+
+@dataclass
+class StatsSnapshot:
+    """Fonda yangilanadigan umumiy statistika"""
+    users_count: int
+    movies_count: int
+    total_views: int
+    active_1d: int
+    active_7d: int
+    active_30d: int
+    refreshed_at: datetime
+
+# create_all mavjud jadvallarga yangi ustun qo'shmaydi
+MIGRATIONS = [
+    "ALTER TABLE required_channels ADD COLUMN IF NOT EXISTS username VARCHAR",
+    "ALTER TABLE required_channels ADD COLUMN IF NOT EXISTS invite_link VARCHAR",
+    "ALTER TABLE movies ADD COLUMN IF NOT EXISTS rating_sum INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE movies ADD COLUMN IF NOT EXISTS rating_count INTEGER NOT NULL DEFAULT 0",
+    "ALTER TABLE movies ADD COLUMN IF NOT EXISTS media_type VARCHAR",
+    "ALTER TABLE movies ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1",
+]
+
+MEDIA_VIDEO = "video"
+MEDIA_DOCUMENT = "document"
+
+# Bot API file_id ichidagi fayl turi (TDLib FileType)
+_FILE_ID_MEDIA_TYPES = {4: MEDIA_VIDEO, 5: MEDIA_DOCUMENT, 17: MEDIA_DOCUMENT}
+
+def media_type_from_file_id(file_id: str) -> Optional[str]:
+    """
+    file_id dan media turini aniqlash (API so'rovisiz).
+    file_id - base64url + nol baytlar RLE, boshidagi 4 bayt - fayl turi.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(file_id + "=" * (-len(file_id) % 4))
+    except (ValueError, TypeError):
+        return None
+    data = bytearray()
+    zero_run = False
+    for byte in raw:
+        if zero_run:
+            data.extend(b"\x00" * byte)
+            zero_run = False
+        elif byte == 0:
+            zero_run = True
+        else:
+            data.append(byte)
+    if len(data) < 4:
+        return None
+    # Yuqori bitlar - web location / file reference bayroqlari
+    type_id = int.from_bytes(data[:4], "little") & 0x00FFFFFF
+    return _FILE_ID_MEDIA_TYPES.get(type_id)
+
+VIEW_WRITE_CHUNK = 5000
+VIEW_FLUSH_MAX_BACKOFF = 60.0  # baza ishlamayotganda flushlar orasidagi eng uzun kutish (s)
+
+class ViewBuffer:
+    """
+    Ko'rishlarni xotirada yig'ib, guruhlab yozish (write-behind).
+    Har flush_interval soniyada yoki max_events ga yetganda bitta INSERT
+    va bitta guruhlangan UPDATE bajariladi.
+    """
+
+    def __init__(self, session_maker: async_sessionmaker, flush_interval: float, max_events: int):
+        self.session_maker = session_maker
+        self.flush_interval = flush_interval
+        self.max_events = max_events
+        self._events: List[Tuple[int, int, datetime]] = []
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        # Hajm bo'yicha flush signali - bir vaqtda bittadan ortiq flush rejalashtirilmaydi
+        self._wakeup = asyncio.Event()
+        self._failures = 0
+
+    def add(self, user_id: int, movie_id: int):
+        self._events.append((user_id, movie_id, datetime.utcnow()))
+        if len(self._events) >= self.max_events:
+            self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Fon taskini to'xtatib, qolgan ko'rishlarni yozish"""
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if await self.flush():
+                self._failures = 0
+                continue
+            # Baza ishlamayapti - keyingi urinishgacha kutish oshib boradi
+            self._failures += 1
+            await asyncio.sleep(min(self.flush_interval * 2 ** self._failures, VIEW_FLUSH_MAX_BACKOFF))
+
+    async def flush(self) -> bool:
+        """Buferni yozish; xatolikda ko'rishlar buferga qaytariladi va False qaytadi"""
+        async with self._lock:
+            events, self._events = self._events, []
+            if not events:
+                return True
+            try:
+                await self._write(events)
+                return True
+            except Exception as e:
+                logger.error(f"Ko'rishlarni yozishda xatolik ({len(events)} ta): {e}")
+                # Keyingi flushda qayta urinish (xotira cheklangan)
+                if len(self._events) < self.max_events * 10:
+                    self._events[:0] = events
+                return False
+
+    async def _write(self, events: List[Tuple[int, int, datetime]]):
+        async with self.session_maker() as session:
+            # asyncpg parametrlar soni cheklangan - katta buferni bo'laklab yozish
+            for i in range(0, len(events), VIEW_WRITE_CHUNK):
+                chunk = events[i:i + VIEW_WRITE_CHUNK]
+                deltas = Counter(movie_id for _, movie_id, _ in chunk)
+                views = values(
+                    column('user_id', BigInteger),
+                    column('movie_id', Integer),
+                    column('viewed_at', DateTime),
+                    name='v'
+                ).data(chunk)
+                counts = values(
+                    column('movie_id', Integer),
+                    column('delta', Integer),
+                    name='d'
+                ).data(sorted(deltas.items()))
+
+                # Bazada yo'q foydalanuvchilar (FK) butun batchni buzmasligi uchun
+                await session.execute(
+                    insert(MovieView).from_select(
+                        ['user_id', 'movie_id', 'viewed_at'],
+                        select(views.c.user_id, views.c.movie_id, views.c.viewed_at)
+                        .where(views.c.user_id.in_(select(User.id)))
+                    )
+                )
+                await session.execute(
+                    update(Movie)
+                    .where(Movie.id == counts.c.movie_id)
+                    .values(views_count=Movie.views_count + counts.c.delta)
+                )
+            await session.commit()
+
+# Qidiruv indekslari (pg_trgm bo'lmasa ILIKE bilan ishlashda davom etadi)
+SEARCH_MIGRATIONS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS idx_movie_title_trgm ON movies USING gin (title gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_movie_genre_trgm ON movies USING gin (genre gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS idx_movie_search_tsv ON movies USING gin "
+    "(to_tsvector('simple', coalesce(title, '') || ' ' || coalesce(genre, '')))",
+]
+
+# pg_try_advisory_lock(namespace, job_id) - rassilka joblari uchun kalitlar fazosi
+BROADCAST_LOCK_NAMESPACE = 7301
+
+# Ko'p jarayonli rejimda keshlarni boshqa jarayonlarda tozalash (LISTEN/NOTIFY)
+CACHE_NOTIFY_CHANNEL = "bot_cache_invalidation"
+
+SEARCH_INDEXES = ("idx_movie_title_trgm", "idx_movie_genre_trgm", "idx_movie_search_tsv")
+
+# Ifoda idx_movie_search_tsv bilan aynan bir xil bo'lishi kerak
+SEARCH_VECTOR = literal_column(
+    "to_tsvector('simple', coalesce(movies.title, '') || ' ' || coalesce(movies.genre, ''))"
+)
+
+def build_prefix_tsquery(query: str) -> Optional[str]:
+    """'avatar su' -> 'avatar:* & su:*' (inline qidiruvda so'z boshlari ham topiladi)"""
+    words = re.findall(r"\w+", query.lower())
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+def like_pattern(query: str) -> str:
+    """ILIKE uchun '%so'rov%' (foydalanuvchi kiritgan %, _ va \\ oddiy belgi sifatida)"""
+    escaped = query.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
 class Database:
-    def __init__(self, db_url: str):
+    def __init__(self, db_url: str, pool_size: int = None, max_overflow: int = None):
+        # pool_pre_ping har checkoutda qo'shimcha so'rov qiladi - o'rniga _health_checker
         self.engine = create_async_engine(
             db_url, 
-            pool_recycle=3600,
-            pool_pre_ping=True,
+            pool_size=pool_size or config.DB_POOL_SIZE,
+            max_overflow=config.DB_MAX_OVERFLOW if max_overflow is None else max_overflow,
+            pool_timeout=config.DB_POOL_TIMEOUT,
+            pool_recycle=config.DB_POOL_RECYCLE,
+            poolclass=InstrumentedPool,
+            connect_args={
+                # asyncpg va SQLAlchemy adapterining prepared statement keshlari
+                'statement_cache_size': config.DB_STATEMENT_CACHE_SIZE,
+                'prepared_statement_cache_size': config.DB_STATEMENT_CACHE_SIZE,
+            },
             echo=False
         )
+        self.profiler = QueryProfiler(self.engine)
         self.session_maker = async_sessionmaker(
             self.engine, 
             expire_on_commit=False,
             class_=AsyncSession
         )
+        self.view_buffer = ViewBuffer(
+            self.session_maker,
+            flush_interval=config.VIEW_FLUSH_INTERVAL_MS / 1000,
+            max_events=config.VIEW_FLUSH_MAX_EVENTS
+        )
+        self.movie_cache = TTLCache(maxsize=config.MOVIE_CACHE_SIZE, ttl=config.CACHE_TTL)
+        # Reyting/ko'rishlar boshqa jarayonlarda ham o'zgaradi - ular qisqa TTL bilan yangilanadi
+        self._fresh_stats = TTLCache(maxsize=config.MOVIE_CACHE_SIZE, ttl=config.MOVIE_STATS_TTL)
+        self.search_indexed = False
+        self.stats_snapshot: Optional[StatsSnapshot] = None
+        # Kino qo'shilganda/o'zgarganda oshadi - tayyor ro'yxatlar keshi uchun
+        self.catalog_version = 0
+        self.catalog_changed = asyncio.Event()
+        # Majburiy kanallar o'zgarganda oshadi - kanallar keshi uchun
+        self.channels_version = 0
+        self._instance_id = uuid.uuid4().hex
+        self._notify_tasks: Set[asyncio.Task] = set()
+        self._background_tasks: List[asyncio.Task] = []
 
     async def init_db(self):
         async with self.engine.begin() as conn:
             await conn.run_sync(Base.metadata.create_all)
+            for statement in MIGRATIONS:
+                await conn.execute(text(statement))
+        
+        try:
+            async with self.engine.begin() as conn:
+                for statement in SEARCH_MIGRATIONS:
+                    await conn.execute(text(statement))
+            self.search_indexed = True
+        except Exception as e:
+            logger.warning(f"pg_trgm/full-text indekslari yaratilmadi, ILIKE qidiruv ishlatiladi: {e}")
         logger.info("Database initialized successfully")
 
+    async def detect_search_indexes(self) -> bool:
+        """Qidiruv indekslari mavjudligini DDL siz tekshirish (init_db qilmagan jarayonlar uchun)"""
+        names = list(SEARCH_INDEXES)
+        try:
+            async with self.engine.connect() as conn:
+                found = (await conn.execute(
+                    text("SELECT count(*) FROM pg_indexes WHERE tablename = 'movies' AND indexname = ANY(:names)"),
+                    {"names": names}
+                )).scalar_one()
+        except Exception as e:
+            logger.warning(f"Qidiruv indekslarini tekshirishda xatolik, ILIKE qidiruv ishlatiladi: {e}")
+            found = 0
+        self.search_indexed = found == len(names)
+        return self.search_indexed
+
+    def start_background_tasks(self):
+        """Ko'rishlar buferi va statistika yangilovchisini ishga tushirish"""
+        self.view_buffer.start()
+        self._background_tasks.append(asyncio.create_task(self._stats_refresher()))
+        self._background_tasks.append(asyncio.create_task(self._backfill_media_types_once()))
+        self._background_tasks.append(asyncio.create_task(self._health_checker()))
+        if config.WORKER_PROCESSES > 1:
+            self._background_tasks.append(asyncio.create_task(self._invalidation_listener()))
+
+    async def stop_background_tasks(self):
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks = []
+        await self.view_buffer.stop()
+
+    async def ping(self) -> bool:
+        """Baza bilan aloqa (readiness tekshiruvi)"""
+        async with self.engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+        return True
+
+    async def _ping_direct(self):
+        """
+        Pooldan tashqari, alohida ulanish bilan tekshirish: pool band bo'lsa
+        (checkout timeout) bu baza uzilgani emas.
+        """
+        dsn = self.engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        conn = await asyncpg.connect(dsn, timeout=config.DB_HEALTH_CHECK_TIMEOUT, statement_cache_size=0)
+        try:
+            await conn.fetchval("SELECT 1")
+        finally:
+            await conn.close()
+
+    async def _health_checker(self):
+        """
+        Vaqti-vaqti bilan bazani tekshirish. Aloqa uzilgan bo'lsa pooldagi
+        barcha ulanishlar tashlanadi - keyingi so'rovlar yangi ulanish oladi.
+        """
+        while True:
+            await asyncio.sleep(config.DB_HEALTH_CHECK_INTERVAL)
+            try:
+                await asyncio.wait_for(self._ping_direct(), timeout=config.DB_HEALTH_CHECK_TIMEOUT)
+            except Exception as e:
+                logger.warning(f"Baza tekshiruvi muvaffaqiyatsiz, pool yangilanmoqda: {e}")
+                await self.engine.dispose()
+
+    # --- Jarayonlararo kesh invalidatsiyasi ---
+    def _publish(self, **message):
+        """O'zgarishni boshqa worker jarayonlarga e'lon qilish (fonda)"""
+        if config.WORKER_PROCESSES <= 1:
+            return
+        payload = json.dumps({"origin": self._instance_id, **message})
+        task = asyncio.create_task(self._send_notify(payload))
+        self._notify_tasks.add(task)
+        task.add_done_callback(self._notify_tasks.discard)
+
+    async def _send_notify(self, payload: str):
+        try:
+            async with self.engine.connect() as conn:
+                await conn.execute(
+                    text("SELECT pg_notify(:channel, :payload)"),
+                    {"channel": CACHE_NOTIFY_CHANNEL, "payload": payload}
+                )
+                await conn.commit()
+        except Exception as e:
+            logger.warning(f"Kesh invalidatsiyasini yuborishda xatolik: {e}")
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        if message.get("origin") == self._instance_id:
+            return
+        kind = message.get("kind")
+        if kind == "movie":
+            self._drop_movie(message["id"], *message.get("codes", []))
+        elif kind == "catalog":
+            self._catalog_updated()
+        elif kind == "channels":
+            self.channels_version += 1
+
+    def _reset_local_caches(self):
+        self.movie_cache.clear()
+        self._catalog_updated()
+        self.channels_version += 1
+
+    async def _invalidation_listener(self):
+        """
+        Boshqa workerlardagi admin o'zgarishlarini LISTEN orqali olish.
+        Pooldan bitta ulanish doimiy band bo'ladi; uzilsa qayta ulanadi.
+        """
+        while True:
+            try:
+                async with self.engine.connect() as conn:
+                    raw = await conn.get_raw_connection()
+                    driver = raw.driver_connection
+                    await driver.add_listener(CACHE_NOTIFY_CHANNEL, self._on_notification)
+                    # Ulanish bo'lmagan paytdagi xabarlar yo'qolgan bo'lishi mumkin
+                    self._reset_local_caches()
+                    try:
+                        while True:
+                            await asyncio.sleep(config.DB_HEALTH_CHECK_INTERVAL)
+                            await driver.execute("SELECT 1")
+                    finally:
+                        try:
+                            await driver.remove_listener(CACHE_NOTIFY_CHANNEL, self._on_notification)
+                        except Exception:
+                            pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Kesh invalidatsiyasi tinglovchisi uzildi, qayta ulanmoqda: {e}")
+                await asyncio.sleep(5)
+
     # --- User Methods ---
     async def add_user(self, user_id: int, username: str, first_name: str = None):
         async with self.session_maker() as session:
@@ -142,6 +560,17 @@ class Database:
             result = await session.execute(select(User.id))
             return result.scalars().all()
 
+    async def get_user_ids_after(self, after_id: int, limit: int = 1000) -> Sequence[int]:
+        """Keyset pagination: after_id dan katta ID lar"""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(User.id)
+                .where(User.id > after_id)
+                .order_by(User.id)
+                .limit(limit)
+            )
+            return result.scalars().all()
+
     async def get_users_count(self) -> int:
         async with self.session_maker() as session:
             result = await session.execute(select(func.count(User.id)))
@@ -169,7 +598,8 @@ class Database:
         duration: int = None,
         quality: str = "HD",
         imdb_rating: float = None,
-        thumbnail_file_id: str = None
+        thumbnail_file_id: str = None,
+        media_type: str = None
     ) -> Movie:
         async with self.session_maker() as session:
             movie = Movie(
@@ -183,36 +613,187 @@ class Database:
                 duration=duration,
                 quality=quality,
                 imdb_rating=imdb_rating,
-                thumbnail_file_id=thumbnail_file_id
+                thumbnail_file_id=thumbnail_file_id,
+                media_type=media_type or media_type_from_file_id(file_id)
             )
             session.add(movie)
             await session.commit()
             await session.refresh(movie)
+            self._invalidate_movie(movie.id, movie.code)
             return movie
 
+    async def get_existing_movie_codes(self, codes: Sequence[int]) -> Set[int]:
+        """Berilgan kodlardan bazada band bo'lganlari (o'chirilganlar ham, bitta so'rov)"""
+        if not codes:
+            return set()
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Movie.code).where(
+                    Movie.code == any_(bindparam("codes", list(codes), type_=ARRAY(BigInteger)))
+                )
+            )
+            return set(result.scalars().all())
+
+    async def add_movies_bulk(self, rows: Sequence[dict]) -> List[Movie]:
+        """Kinolarni bitta INSERT bilan qo'shish, band kodlar o'tkazib yuboriladi"""
+        if not rows:
+            return []
+        rows = [
+            {**row, "media_type": row.get("media_type") or media_type_from_file_id(row["file_id"])}
+            for row in rows
+        ]
+        async with self.session_maker() as session:
+            result = await session.scalars(
+                pg_insert(Movie)
+                .on_conflict_do_nothing(index_elements=[Movie.code])
+                .returning(Movie),
+                rows
+            )
+            movies = list(result.all())
+            await session.commit()
+        if movies:
+            self._catalog_updated()
+            self._publish(kind="catalog")
+        return movies
+
     async def get_movie_by_code(self, code: int) -> Optional[Movie]:
+        movie = self.movie_cache.get(('code', code))
+        if movie is not None:
+            await self._refresh_movie_stats(movie)
+            return movie
         async with self.session_maker() as session:
             result = await session.execute(
                 select(Movie).where(Movie.code == code, Movie.is_active == True)
             )
-            return result.scalars().first()
+            movie = result.scalars().first()
+            if movie:
+                self._cache_movie(movie)
+            return movie
 
     async def get_movie_by_id(self, movie_id: int) -> Optional[Movie]:
+        movie = self.movie_cache.get(('id', movie_id))
+        if movie is not None:
+            await self._refresh_movie_stats(movie)
+            return movie
         async with self.session_maker() as session:
             result = await session.execute(select(Movie).where(Movie.id == movie_id))
-            return result.scalars().first()
+            movie = result.scalars().first()
+            if movie:
+                self._cache_movie(movie)
+            return movie
+
+    async def get_movie_for_delivery(
+        self, user_id: int, code: int
+    ) -> Optional[Tuple[Movie, Tuple[float, int], Optional[int]]]:
+        """
+        Kino yuborish uchun bitta so'rov: (kino, reyting, foydalanuvchi bahosi).
+        Ko'rish buferga yoziladi (alohida so'rov yo'q).
+        """
+        movie = self.movie_cache.get(('code', code))
+        async with self.session_maker() as session:
+            if movie is not None:
+                # Keshdagi kino: foydalanuvchi bahosi va yangi agregatlar bitta so'rovda
+                result = await session.execute(
+                    select(Movie.rating_sum, Movie.rating_count, Movie.views_count, MovieRating.rating)
+                    .outerjoin(
+                        MovieRating,
+                        (MovieRating.movie_id == Movie.id) & (MovieRating.user_id == user_id)
+                    )
+                    .where(Movie.id == movie.id)
+                )
+                row = result.first()
+                if not row:
+                    return None
+                self._set_movie_stats(movie, *row[:3])
+                user_rating = row[3]
+            else:
+                result = await session.execute(
+                    select(Movie, MovieRating.rating)
+                    .outerjoin(
+                        MovieRating,
+                        (MovieRating.movie_id == Movie.id) & (MovieRating.user_id == user_id)
+                    )
+                    .where(Movie.code == code, Movie.is_active == True)
+                )
+                row = result.first()
+                if not row:
+                    return None
+                movie, user_rating = row
+                self._cache_movie(movie)
+        
+        await self.add_movie_view(user_id, movie.id)
+        return movie, movie.rating_summary, user_rating
+
+    def _cache_movie(self, movie: Movie):
+        """Sessiyadan ajratilgan kino nusxasini keshlash"""
+        self.movie_cache.set(('id', movie.id), movie)
+        if movie.is_active:
+            self.movie_cache.set(('code', movie.code), movie)
+        self._fresh_stats.set(movie.id, True)
+
+    def _set_movie_stats(self, movie: Movie, rating_sum: int, rating_count: int, views_count: int):
+        movie.rating_sum, movie.rating_count, movie.views_count = rating_sum, rating_count, views_count
+        self._fresh_stats.set(movie.id, True)
+
+    async def _refresh_movie_stats(self, movie: Movie):
+        """Keshdagi kinoning reyting/ko'rishlarini MOVIE_STATS_TTL dan eskirgan bo'lsa yangilash"""
+        if self._fresh_stats.get(movie.id) is not None:
+            return
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Movie.rating_sum, Movie.rating_count, Movie.views_count).where(Movie.id == movie.id)
+            )
+            row = result.first()
+        if row:
+            self._set_movie_stats(movie, *row)
+
+    def _drop_movie(self, movie_id: int, *codes: int):
+        self.movie_cache.delete(('id', movie_id))
+        for code in codes:
+            self.movie_cache.delete(('code', code))
+        self._catalog_updated()
+
+    def _catalog_updated(self):
+        self.catalog_version += 1
+        self.catalog_changed.set()
+
+    def _invalidate_movie(self, movie_id: int, *codes: int):
+        self._drop_movie(movie_id, *codes)
+        self._publish(kind="movie", id=movie_id, codes=list(codes))
+
+    def _invalidate_channels(self):
+        self.channels_version += 1
+        self._publish(kind="channels")
+
+    def get_cache_stats(self) -> dict:
+        """Kino keshi hit/miss hisoblagichlari"""
+        return self.movie_cache.stats()
 
     async def search_movies(self, query: str, limit: int = 10) -> Sequence[Movie]:
-        """Kino qidirish"""
+        """Kino qidirish (full-text + trigram, o'xshashlik va ko'rishlar bo'yicha)"""
+        search_pattern = like_pattern(query)
+        conditions = (
+            Movie.title.ilike(search_pattern, escape="\\")
+            | Movie.genre.ilike(search_pattern, escape="\\")
+        )
+        order_by = [Movie.views_count.desc()]
+        
+        if self.search_indexed:
+            # ILIKE ham trigram GIN indeksidan foydalanadi
+            tsquery = build_prefix_tsquery(query)
+            if tsquery:
+                conditions = conditions | SEARCH_VECTOR.op("@@")(
+                    func.to_tsquery(literal_column("'simple'"), tsquery)
+                )
+            # Xato yozilgan so'zlar uchun (word_similarity >= pg_trgm.word_similarity_threshold)
+            conditions = conditions | literal(query).op("<%")(Movie.title)
+            order_by.insert(0, func.word_similarity(query, Movie.title).desc())
+        
         async with self.session_maker() as session:
-            search_pattern = f"%{query}%"
             result = await session.execute(
                 select(Movie)
-                .where(
-                    Movie.is_active == True,
-                    (Movie.title.ilike(search_pattern) | Movie.genre.ilike(search_pattern))
-                )
-                .order_by(Movie.views_count.desc())
+                .where(Movie.is_active == True, conditions)
+                .order_by(*order_by)
                 .limit(limit)
             )
             return result.scalars().all()
@@ -221,7 +802,7 @@ class Database:
         async with self.session_maker() as session:
             result = await session.execute(
                 select(Movie)
-                .where(Movie.genre.ilike(f"%{genre}%"), Movie.is_active == True)
+                .where(Movie.genre.ilike(like_pattern(genre), escape="\\"), Movie.is_active == True)
                 .order_by(Movie.views_count.desc())
                 .limit(limit)
             )
@@ -262,10 +843,61 @@ class Database:
             result = await session.execute(select(Movie).where(Movie.id == movie_id))
             movie = result.scalars().first()
             if movie:
+                old_code = movie.code
+                changed = False
                 for key, value in kwargs.items():
-                    if hasattr(movie, key):
+                    if hasattr(movie, key) and getattr(movie, key) != value:
                         setattr(movie, key, value)
+                        changed = True
+                if changed:
+                    # Versiya o'zgarsa eski caption keshi ishlatilmaydi
+                    movie.version = Movie.version + 1
                 await session.commit()
+                self._invalidate_movie(movie_id, old_code, movie.code)
+
+    async def set_movie_media_type(self, movie_id: int, media_type: str):
+        """Ishlagan yuborish usulini saqlash (keyingi yuborishlar to'g'ridan-to'g'ri)"""
+        async with self.session_maker() as session:
+            await session.execute(
+                update(Movie).where(Movie.id == movie_id).values(media_type=media_type)
+            )
+            await session.commit()
+        movie = self.movie_cache.peek(('id', movie_id))
+        if movie is not None:
+            movie.media_type = media_type
+
+    async def backfill_media_types(self) -> int:
+        """media_type bo'sh kinolar uchun turini file_id dan aniqlash"""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(Movie.id, Movie.file_id).where(Movie.media_type.is_(None))
+            )
+            rows = [
+                (movie_id, media_type)
+                for movie_id, file_id in result.all()
+                if (media_type := media_type_from_file_id(file_id))
+            ]
+            if not rows:
+                return 0
+            changes = values(
+                column('id', Integer), column('media_type', String), name='changes'
+            ).data(rows)
+            await session.execute(
+                update(Movie)
+                .where(Movie.id == changes.c.id)
+                .values(media_type=changes.c.media_type)
+            )
+            await session.commit()
+        self.movie_cache.clear()
+        return len(rows)
+
+    async def _backfill_media_types_once(self):
+        try:
+            updated = await self.backfill_media_types()
+            if updated:
+                logger.info(f"media_type aniqlandi: {updated} ta kino")
+        except Exception as e:
+            logger.error(f"media_type backfill xatoligi: {e}")
 
     async def delete_movie(self, movie_id: int):
         """Kinoni o'chirish (soft delete)"""
@@ -289,37 +921,71 @@ class Database:
             )
             return result.scalar_one()
 
-    async def add_required_channel(self, channel_id: int, title: str, priority: int = 0):
+    async def add_required_channel(
+        self,
+        channel_id: int,
+        title: str,
+        priority: int = 0,
+        username: str = None,
+        invite_link: str = None
+    ):
         async with self.session_maker() as session:
-            channel = RequiredChannel(channel_id=channel_id, title=title, priority=priority)
+            channel = RequiredChannel(
+                channel_id=channel_id,
+                title=title,
+                priority=priority,
+                username=username,
+                invite_link=invite_link
+            )
             session.add(channel)
             await session.commit()
+        self._invalidate_channels()
+
+    async def update_required_channel_link(self, channel_id: int, username: str = None, invite_link: str = None):
+        """Kanal username/linkini saqlash"""
+        async with self.session_maker() as session:
+            await session.execute(
+                update(RequiredChannel)
+                .where(RequiredChannel.channel_id == channel_id)
+                .values(username=username, invite_link=invite_link)
+            )
+            await session.commit()
+        self._invalidate_channels()
 
     async def delete_required_channel(self, channel_id: int):
         async with self.session_maker() as session:
             stmt = delete(RequiredChannel).where(RequiredChannel.channel_id == channel_id)
             await session.execute(stmt)
             await session.commit()
+        self._invalidate_channels()
 
     # --- Views & Ratings ---
     async def add_movie_view(self, user_id: int, movie_id: int):
-        """Kino ko'rilganini qayd etish"""
-        async with self.session_maker() as session:
-            # Ko'rishni qayd qilish
-            view = MovieView(user_id=user_id, movie_id=movie_id)
-            session.add(view)
-            
-            # Ko'rishlar sonini oshirish
-            result = await session.execute(select(Movie).where(Movie.id == movie_id))
-            movie = result.scalars().first()
-            if movie:
-                movie.views_count += 1
-            
-            await session.commit()
+        """Kino ko'rilganini qayd etish (buferga yoziladi)"""
+        self.view_buffer.add(user_id, movie_id)
+        movie = self.movie_cache.peek(('id', movie_id))
+        if movie is not None:
+            movie.views_count += 1
+
+    async def flush_views(self):
+        """Buferdagi ko'rishlarni darhol bazaga yozish"""
+        await self.view_buffer.flush()
 
-    async def add_rating(self, user_id: int, movie_id: int, rating: int, review: str = None):
-        """Kinoga baho berish"""
+    async def add_rating(self, user_id: int, movie_id: int, rating: int, review: str = None) -> Tuple[float, int]:
+        """Kinoga baho berish, yangilangan (o'rtacha baho, baholar soni) qaytaradi"""
         async with self.session_maker() as session:
+            # Kino qatorini bloklash - bir kinoga baholar ketma-ket yoziladi
+            await session.execute(
+                select(Movie.id).where(Movie.id == movie_id).with_for_update()
+            )
+            old_result = await session.execute(
+                select(MovieRating.rating).where(
+                    MovieRating.user_id == user_id,
+                    MovieRating.movie_id == movie_id
+                )
+            )
+            old_rating = old_result.scalar_one_or_none()
+            
             stmt = (
                 pg_insert(MovieRating)
                 .values(user_id=user_id, movie_id=movie_id, rating=rating, review=review)
@@ -329,19 +995,50 @@ class Database:
                 )
             )
             await session.execute(stmt)
+            
+            # Agregatlarni yangilash (qayta baholashda faqat farq qo'shiladi)
+            result = await session.execute(
+                update(Movie)
+                .where(Movie.id == movie_id)
+                .values(
+                    rating_sum=Movie.rating_sum + rating - (old_rating or 0),
+                    rating_count=Movie.rating_count + (0 if old_rating is not None else 1)
+                )
+                .returning(Movie.rating_sum, Movie.rating_count)
+            )
+            rating_sum, rating_count = result.one()
             await session.commit()
+            
+            movie = self.movie_cache.peek(('id', movie_id))
+            if movie is not None:
+                movie.rating_sum, movie.rating_count = rating_sum, rating_count
+            return rating_tuple(rating_sum, rating_count)
 
     async def get_movie_rating(self, movie_id: int) -> Tuple[float, int]:
         """Kino reytingini olish (o'rtacha baho, baholar soni)"""
         async with self.session_maker() as session:
             result = await session.execute(
-                select(
-                    func.avg(MovieRating.rating),
-                    func.count(MovieRating.id)
-                ).where(MovieRating.movie_id == movie_id)
+                select(Movie.rating_sum, Movie.rating_count).where(Movie.id == movie_id)
             )
-            avg_rating, count = result.first()
-            return (round(avg_rating, 1) if avg_rating else 0.0, count or 0)
+            row = result.first()
+            return rating_tuple(*row) if row else (0.0, 0)
+
+    async def reconcile_movie_ratings(self) -> int:
+        """rating_sum/rating_count ni movie_ratings dan qayta hisoblash (backfill)"""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                update(Movie).values(
+                    rating_sum=select(func.coalesce(func.sum(MovieRating.rating), 0))
+                    .where(MovieRating.movie_id == Movie.id)
+                    .scalar_subquery(),
+                    rating_count=select(func.count(MovieRating.id))
+                    .where(MovieRating.movie_id == Movie.id)
+                    .scalar_subquery()
+                )
+            )
+            await session.commit()
+            self.movie_cache.clear()
+            return result.rowcount
 
     async def get_user_movie_rating(self, user_id: int, movie_id: int) -> Optional[MovieRating]:
         """Foydalanuvchining kinoga bergan bahoini olish"""
@@ -375,6 +1072,54 @@ class Database:
                 'ratings_count': ratings_count
             }
 
+    async def refresh_stats_snapshot(self) -> StatsSnapshot:
+        """Umumiy statistikani qayta hisoblash (fon taskida)"""
+        now = datetime.utcnow()
+        async with self.session_maker() as session:
+            users_result = await session.execute(
+                select(
+                    func.count(User.id),
+                    func.count(User.id).filter(User.last_active >= now - timedelta(days=1)),
+                    func.count(User.id).filter(User.last_active >= now - timedelta(days=7)),
+                    func.count(User.id).filter(User.last_active >= now - timedelta(days=30))
+                )
+            )
+            users_count, active_1d, active_7d, active_30d = users_result.one()
+            
+            # movie_views ni sanash o'rniga views_count yig'indisi
+            movies_result = await session.execute(
+                select(
+                    func.count(Movie.id).filter(Movie.is_active == True),
+                    func.coalesce(func.sum(Movie.views_count), 0)
+                )
+            )
+            movies_count, total_views = movies_result.one()
+        
+        self.stats_snapshot = StatsSnapshot(
+            users_count=users_count,
+            movies_count=movies_count,
+            total_views=total_views,
+            active_1d=active_1d,
+            active_7d=active_7d,
+            active_30d=active_30d,
+            refreshed_at=now
+        )
+        return self.stats_snapshot
+
+    async def get_stats_snapshot(self) -> StatsSnapshot:
+        """Oxirgi statistika (faqat birinchi chaqiruvda bazaga murojaat)"""
+        if self.stats_snapshot is None:
+            return await self.refresh_stats_snapshot()
+        return self.stats_snapshot
+
+    async def _stats_refresher(self):
+        while True:
+            try:
+                await self.refresh_stats_snapshot()
+            except Exception as e:
+                logger.error(f"Statistikani yangilashda xatolik: {e}")
+            await asyncio.sleep(config.STATS_REFRESH_INTERVAL)
+
     async def get_global_stats(self) -> dict:
         """Umumiy statistika"""
         async with self.session_maker() as session:
@@ -388,4 +1133,109 @@ class Database:
                 'users_count': users_count,
                 'movies_count': movies_count,
                 'total_views': total_views
-            }
\ No newline at end of file
+            }
+
+    # --- Broadcast Jobs ---
+    async def create_broadcast_job(
+        self,
+        from_chat_id: int,
+        message_id: int,
+        total: int,
+        progress_chat_id: int = None,
+        progress_message_id: int = None
+    ) -> BroadcastJob:
+        async with self.session_maker() as session:
+            job = BroadcastJob(
+                from_chat_id=from_chat_id,
+                message_id=message_id,
+                total=total,
+                progress_chat_id=progress_chat_id,
+                progress_message_id=progress_message_id
+            )
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            return job
+
+    async def get_unfinished_broadcast_jobs(self) -> Sequence[BroadcastJob]:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(BroadcastJob)
+                .where(BroadcastJob.status == "running")
+                .order_by(BroadcastJob.id)
+            )
+            return result.scalars().all()
+
+    async def get_broadcast_job(self, job_id: int) -> Optional[BroadcastJob]:
+        async with self.session_maker() as session:
+            return await session.get(BroadcastJob, job_id)
+
+    @asynccontextmanager
+    async def broadcast_job_lock(self, job_id: int) -> AsyncIterator[bool]:
+        """
+        Jobni bitta jarayonga biriktirish (session darajasidagi advisory lock).
+        Lock job davomida alohida ulanishda ushlab turiladi; jarayon o'lsa ulanish
+        bilan birga bo'shaydi. Boshqa jarayon egallagan bo'lsa False beriladi.
+        """
+        params = {"namespace": BROADCAST_LOCK_NAMESPACE, "job_id": job_id}
+        async with self.engine.connect() as conn:
+            locked = (await conn.execute(
+                text("SELECT pg_try_advisory_lock(:namespace, :job_id)"), params
+            )).scalar_one()
+            await conn.commit()
+            try:
+                yield locked
+            finally:
+                if locked:
+                    try:
+                        await conn.execute(text("SELECT pg_advisory_unlock(:namespace, :job_id)"), params)
+                        await conn.commit()
+                    except Exception as e:
+                        # Ulanish uzilgan bo'lsa lock allaqachon bo'shagan
+                        logger.warning(f"Rassilka #{job_id} lockini bo'shatishda xatolik: {e}")
+
+    async def update_broadcast_job(self, job_id: int, **kwargs):
+        """Checkpoint va hisoblagichlarni saqlash"""
+        async with self.session_maker() as session:
+            await session.execute(
+                update(BroadcastJob).where(BroadcastJob.id == job_id).values(**kwargs)
+            )
+            await session.commit()
+
+    # --- FSM Storage ---
+    async def get_fsm_record(self, key: str, min_updated_at: datetime) -> Optional[Tuple[Optional[str], dict]]:
+        """(state, data) yoki muddati o'tgan/yo'q bo'lsa None"""
+        async with self.session_maker() as session:
+            result = await session.execute(
+                select(FSMRecord.state, FSMRecord.data)
+                .where(FSMRecord.key == key, FSMRecord.updated_at >= min_updated_at)
+            )
+            row = result.first()
+            return (row.state, row.data or {}) if row else None
+
+    async def set_fsm_field(self, key: str, **fields):
+        """state yoki data ni upsert qilish; ikkalasi ham bo'sh bo'lsa yozuv o'chiriladi"""
+        async with self.session_maker() as session:
+            changes = {**fields, 'updated_at': datetime.utcnow()}
+            await session.execute(
+                pg_insert(FSMRecord)
+                .values(key=key, **changes)
+                .on_conflict_do_update(index_elements=[FSMRecord.key], set_=changes)
+            )
+            if not any(fields.values()):
+                await session.execute(
+                    delete(FSMRecord).where(
+                        FSMRecord.key == key,
+                        FSMRecord.state.is_(None),
+                        (FSMRecord.data.is_(None)) | (FSMRecord.data == text("'{}'::jsonb"))
+                    )
+                )
+            await session.commit()
+
+    async def delete_expired_fsm_records(self, older_than: datetime) -> int:
+        async with self.session_maker() as session:
+            result = await session.execute(
+                delete(FSMRecord).where(FSMRecord.updated_at < older_than)
+            )
+            await session.commit()
+            return result.rowcount
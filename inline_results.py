@@ -0,0 +1,63 @@
+from typing import List, Optional, Sequence, Tuple
+
+from aiogram.types import InlineQueryResultArticle
+
+from cache import TTLCache
+from config import config
+
+# ((kichik harfli nom, kichik harfli janr), tayyor natija)
+Entry = Tuple[Tuple[str, str], InlineQueryResultArticle]
+
+
+def normalize_query(query: str) -> str:
+    """Kesh kaliti: kichik harf, ortiqcha bo'sh joylarsiz"""
+    return " ".join(query.lower().split())
+
+
+def _matches(query: str, fields: Sequence[str]) -> bool:
+    # Database.search_movies ning ILIKE yo'li bilan bir xil: nom yoki janrda butun so'rov
+    return any(query in field for field in fields)
+
+
+class InlineResultCache:
+    """
+    Inline qidiruv natijalari keshi (normallashtirilgan so'rov + katalog versiyasi).
+    Har harf kiritilganda qayta qidirmaslik uchun: uzunroq so'rov keshda bo'lmasa,
+    uning prefiksi uchun to'liq (limitdan kam) natija bo'lsa, o'sha natijalar xotirada filtrlanadi.
+    Bu faqat oddiy ILIKE qidiruvda to'g'ri (reuse_prefix): trigram/full-text qidiruv
+    prefiks natijalarida bo'lmagan kinolarni ham topadi va boshqacha tartiblaydi.
+    """
+
+    def __init__(self, maxsize: int = None, ttl: float = None):
+        self._cache = TTLCache(
+            maxsize=maxsize or config.INLINE_CACHE_SIZE,
+            ttl=ttl or config.INLINE_CACHE_TTL
+        )
+
+    def get(self, query: str, version: int, reuse_prefix: bool = False) -> Optional[List[InlineQueryResultArticle]]:
+        item = self._cache.get((query, version))
+        if item is not None:
+            return [result for _, result in item[0]]
+        if not reuse_prefix:
+            return None
+
+        # Eng uzun prefiksdan boshlab qidirish
+        for end in range(len(query) - 1, 0, -1):
+            item = self._cache.peek((query[:end], version))
+            if item is None:
+                continue
+            entries, complete = item
+            if not complete:
+                return None
+            # Prefiks natijalari views_count bo'yicha tartiblangan - filtrlash tartibni saqlaydi
+            filtered = [entry for entry in entries if _matches(query, entry[0])]
+            self._cache.set((query, version), (filtered, True))
+            return [result for _, result in filtered]
+        return None
+
+    def set(self, query: str, version: int, entries: List[Entry], complete: bool):
+        """complete - natijalar limitga yetmagan (so'rovga mos hamma kino shu yerda)"""
+        self._cache.set((query, version), (entries, complete))
+
+    def stats(self) -> dict:
+        return self._cache.stats()
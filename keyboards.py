@@ -18,6 +18,7 @@ def get_admin_panel_kb() -> InlineKeyboardMarkup:
     kb.button(text="➕ Kino qo'shish", callback_data="admin_add_movie")
     kb.button(text="📝 Kino tahrirlash", callback_data="admin_edit_movie")
     kb.button(text="🗑 Kino o'chirish", callback_data="admin_delete_movie")
+    kb.button(text="📥 Import (CSV/JSON)", callback_data="admin_import")
     kb.button(text="📢 Rassilka", callback_data="admin_broadcast")
     kb.button(text="📊 Statistika", callback_data="admin_stats")
     kb.button(text="🔐 Majburiy obuna", callback_data="admin_fsub")
@@ -1,7 +1,10 @@
 import asyncio
 import logging
+import signal
 from aiogram import Bot, Dispatcher, F
-from aiogram.types import Message, CallbackQuery, BotCommand
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Message, CallbackQuery, BotCommand, Update
 from aiogram.filters import CommandStart, Command
 from aiogram.fsm.context import FSMContext
 from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
@@ -10,6 +13,13 @@ from config import config
 from database import Database
 from admin import router as admin_router
 from user_handlers import router as user_router
+from broadcast import resume_broadcast_jobs
+from metrics import MetricsServer, instrument_bot, instrument_database, instrument_dispatcher, instrument_engine
+from middlewares import ThrottlingMiddleware
+from movie_lists import MovieLists
+from storage import PostgresStorage
+from webhook import WebhookServer
+from workers import UpdateRouter, poll_updates
 from utils import check_subscription, format_movie_info, send_movie_with_caption, validate_movie_code
 from keyboards import get_main_menu_kb, get_movie_actions_kb
 
@@ -21,8 +31,16 @@ logger = logging.getLogger(__name__)
 
 # Asosiy ob'ektlar
 db = Database(config.DATABASE_URL)
-bot = Bot(token=config.BOT_TOKEN)
-dp = Dispatcher()
+bot = Bot(
+    token=config.BOT_TOKEN,
+    session=AiohttpSession(api=TelegramAPIServer.from_base(config.TELEGRAM_API_URL))
+    if config.TELEGRAM_API_URL else None
+)
+storage = PostgresStorage(db) if config.FSM_STORAGE == "postgres" else None
+movie_lists = MovieLists(db)
+throttling = ThrottlingMiddleware()
+metrics_server = MetricsServer(ready_check=db.ping)
+dp = Dispatcher(storage=storage)
 
 # --- Asosiy Handlerlar ---
 
@@ -68,7 +86,7 @@ async def cmd_start(message: Message, db: Database, state: FSMContext):
 @dp.callback_query(F.data == "check_fsub")
 async def check_subscription_callback(call: CallbackQuery, db: Database):
     """Obuna tekshirish callback"""
-    is_subscribed, kb = await check_subscription(call.from_user.id, db, bot)
+    is_subscribed, kb = await check_subscription(call.from_user.id, db, bot, recheck=True)
     
     if is_subscribed:
         await call.message.edit_text(
@@ -109,9 +127,9 @@ async def send_movie_to_user(user_id: int, movie_code: int, db: Database):
         )
         return
     
-    # Kinoni topish
-    movie = await db.get_movie_by_code(movie_code)
-    if not movie:
+    # Kino, reyting va foydalanuvchi bahosi - bitta so'rovda
+    delivery = await db.get_movie_for_delivery(user_id, movie_code)
+    if not delivery:
         await bot.send_message(
             user_id,
             f"❌ <code>{movie_code}</code> kodli kino topilmadi.\n\n"
@@ -120,26 +138,22 @@ async def send_movie_to_user(user_id: int, movie_code: int, db: Database):
             reply_markup=get_main_menu_kb()
         )
         return
-    
-    # Ko'rishni qayd qilish
-    await db.add_movie_view(user_id, movie.id)
-    
-    # Reytingni olish
-    rating = await db.get_movie_rating(movie.id)
-    user_rating = await db.get_user_movie_rating(user_id, movie.id)
+    movie, rating, user_rating = delivery
     
     # Ma'lumotlarni formatlash
     caption = format_movie_info(movie, rating, include_stats=True)
     
     # Kinoni yuborish
     try:
-        await send_movie_with_caption(
+        media_type = await send_movie_with_caption(
             bot,
             user_id,
             movie,
             caption,
             reply_markup=get_movie_actions_kb(movie_code, bool(user_rating))
         )
+        if media_type != movie.media_type:
+            await db.set_movie_media_type(movie.id, media_type)
         logger.info(f"User {user_id} kinoni ko'rdi: {movie.title} (kod: {movie_code})")
     except Exception as e:
         logger.error(f"Kino yuborishda xatolik: {e}")
@@ -165,23 +179,38 @@ async def set_bot_commands():
 
 # --- Startup va Shutdown ---
 
+async def notify_admin(text: str):
+    """Adminga xizmat xabari"""
+    try:
+        await bot.send_message(config.ADMIN_ID, text)
+    except Exception:
+        pass
+
 async def on_startup():
     """Bot ishga tushganda"""
     logger.info("Bot ishga tushmoqda...")
     
     # Database
     await db.init_db()
+    db.start_background_tasks()
+    movie_lists.start()
     logger.info("Database tayyor")
     
+    await metrics_server.start()
+    
+    # Tugallanmagan rassilkalar
+    await resume_broadcast_jobs(bot, db)
+    
+    # Bot ma'lumotlarini keshlash (inline rejim har so'rovda getMe chaqirmaydi)
+    me = await bot.me()
+    logger.info(f"Bot: @{me.username}")
+    
     # Bot buyruqlari
     await set_bot_commands()
     logger.info("Bot buyruqlari o'rnatildi")
     
     # Admin xabarnoma
-    try:
-        await bot.send_message(config.ADMIN_ID, "✅ Bot muvaffaqiyatli ishga tushdi!")
-    except Exception:
-        pass
+    await notify_admin("✅ Bot muvaffaqiyatli ishga tushdi!")
     
     logger.info("Bot ishga tushdi!")
 
@@ -189,37 +218,139 @@ async def on_shutdown():
     """Bot to'xtaganda"""
     logger.info("Bot to'xtatilmoqda...")
     
+    # Fon tasklari (buferdagi ko'rishlar yoziladi)
+    await movie_lists.stop()
+    await db.stop_background_tasks()
+    await metrics_server.stop()
+    
     # Admin xabarnoma
-    try:
-        await bot.send_message(config.ADMIN_ID, "⚠️ Bot to'xtatildi!")
-    except Exception:
-        pass
+    await notify_admin("⚠️ Bot to'xtatildi!")
     
     await bot.session.close()
     logger.info("Bot to'xtatildi")
 
 # --- Asosiy funksiya ---
 
-async def main():
-    """Asosiy funksiya"""
+def setup_dispatcher():
+    """Routerlar, middleware data va startup/shutdown"""
     # Routerlarni ulash
     dp.include_router(admin_router)
     dp.include_router(user_router)
     
+    # Anti-flood (handlerlar va bazadan oldin)
+    dp.update.outer_middleware(throttling)
+    
+    # Metrikalar: handlerlar, Bot API, SQL so'rovlar va Database metodlari
+    instrument_dispatcher(dp)
+    instrument_bot(bot)
+    instrument_engine(db.engine)
+    instrument_database(db)
+    
     # Middleware data
     dp["db"] = db
     dp["config"] = config
+    dp["movie_lists"] = movie_lists
+    dp["throttling"] = throttling
     
     # Startup va shutdown
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
+    if storage:
+        dp.startup.register(storage.start)
+
+async def main():
+    """Asosiy funksiya"""
+    setup_dispatcher()
+    
+    if config.RUN_MODE == "webhook" and not config.WEBHOOK_SECRET:
+        raise SystemExit("Webhook rejimi uchun WEBHOOK_SECRET o'rnatilishi shart")
+    
+    if config.WORKER_PROCESSES > 1:
+        await run_partitioned()
+        return
+    
+    if config.RUN_MODE == "webhook":
+        await run_webhook()
+        return
     
     # Polling
     try:
+        await bot.delete_webhook()
         await dp.start_polling(bot, allowed_updates=dp.resolve_used_update_types())
     finally:
         await bot.session.close()
 
+async def process_raw_update(raw_update: dict):
+    """JSON yangilanishni dispatcherga berish (webhook va worker jarayonlar)"""
+    update = Update.model_validate(raw_update, context={"bot": bot})
+    await dp.feed_update(bot, update)
+
+def create_stop_event() -> asyncio.Event:
+    """SIGINT/SIGTERM kelganda o'rnatiladigan event"""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop_event.set)
+    return stop_event
+
+async def set_webhook():
+    if config.WEBHOOK_URL:
+        await bot.set_webhook(
+            url=config.WEBHOOK_URL.rstrip("/") + config.WEBHOOK_PATH,
+            secret_token=config.WEBHOOK_SECRET,
+            allowed_updates=dp.resolve_used_update_types()
+        )
+
+async def run_webhook():
+    """Webhook rejimi (embedded aiohttp server)"""
+    workflow_data = {"dispatcher": dp, "bots": [bot], "bot": bot, **dp.workflow_data}
+    await dp.emit_startup(**workflow_data)
+    
+    server = WebhookServer(process_raw_update)
+    await server.start()
+    await set_webhook()
+    
+    try:
+        await create_stop_event().wait()
+    finally:
+        await server.stop()
+        await dp.emit_shutdown(**workflow_data)
+        await bot.session.close()
+
+async def run_partitioned():
+    """
+    Ko'p jarayonli rejim: bu jarayon yangilanishlarni qabul qiladi (polling
+    yoki webhook) va ularni from_user.id bo'yicha worker jarayonlarga taqsimlaydi.
+    """
+    await db.init_db()
+    await set_bot_commands()
+    
+    router = UpdateRouter(config.WORKER_PROCESSES)
+    router.start()
+    await metrics_server.start()
+    stop_event = create_stop_event()
+    await notify_admin("✅ Bot muvaffaqiyatli ishga tushdi!")
+    
+    try:
+        if config.RUN_MODE == "webhook":
+            server = WebhookServer(router.dispatch)
+            await server.start()
+            await set_webhook()
+            try:
+                await stop_event.wait()
+            finally:
+                await server.stop()
+        else:
+            await bot.delete_webhook()
+            await poll_updates(bot, router.dispatch, dp.resolve_used_update_types(), stop_event)
+    finally:
+        # Workerlar navbatdagi yangilanishlarni tugatib, ko'rishlarni yozib chiqadi
+        await router.stop()
+        await metrics_server.stop()
+        await notify_admin("⚠️ Bot to'xtatildi!")
+        await bot.session.close()
+        await db.engine.dispose()
+
 if __name__ == "__main__":
     try:
         asyncio.run(main())
@@ -0,0 +1,51 @@
+import argparse
+import asyncio
+import logging
+
+from config import config
+from database import Database
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_ratings(db: Database, args: argparse.Namespace):
+    """Kino reyting agregatlarini movie_ratings dan qayta hisoblash"""
+    updated = await db.reconcile_movie_ratings()
+    logger.info(f"Reyting agregatlari yangilandi: {updated} ta kino")
+
+
+async def backfill_media_types(db: Database, args: argparse.Namespace):
+    """Kinolarning media turini file_id dan aniqlash"""
+    updated = await db.backfill_media_types()
+    logger.info(f"media_type aniqlandi: {updated} ta kino")
+
+
+COMMANDS = {
+    "reconcile-ratings": reconcile_ratings,
+    "backfill-media-types": backfill_media_types,
+}
+
+
+async def run(args: argparse.Namespace):
+    db = Database(config.DATABASE_URL)
+    try:
+        await db.init_db()
+        await COMMANDS[args.command](db, args)
+    finally:
+        await db.engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Kino bot xizmat buyruqlari")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("reconcile-ratings", help=reconcile_ratings.__doc__)
+    subparsers.add_parser("backfill-media-types", help=backfill_media_types.__doc__)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import asyncio
+import contextvars
+import functools
+import inspect
+import logging
+import time
+import weakref
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class _Metric(ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        REGISTRY.append(self)
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    @abstractmethod
+    def samples(self) -> List[str]:
+        """Prometheus matn formatidagi qatorlar"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in self._values.items()
+        ]
+
+
+class Gauge(_Metric):
+    """Qiymat o'rnatiladi yoki scrape paytida funksiyadan olinadi"""
+    kind = "gauge"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+        self._callbacks: Dict[LabelValues, Callable[[], float]] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def set_function(self, func: Callable[[], float], **labels):
+        self._callbacks[self._key(labels)] = func
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        for key, func in self._callbacks.items():
+            try:
+                values[key] = func()
+            except Exception:
+                continue
+        return [
+            f"{self.name}{_format_labels(self.label_names, key)} {value}"
+            for key, value in values.items()
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # label -> [bucket hisoblagichlari..., +Inf], yig'indi
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        item = self._values.get(key)
+        if item is None:
+            item = self._values[key] = ([0] * (len(self.buckets) + 1), [0.0])
+        counts, total = item
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, (counts, total) in self._values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                bucket_labels = _format_labels(self.label_names, key, f'le="{le}"')
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            labels = _format_labels(self.label_names, key)
+            lines.append(f"{self.name}_sum{labels} {total[0]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REGISTRY: List[_Metric] = []
+
+
+def render_metrics() -> str:
+    """Prometheus text formati"""
+    return "\n".join(metric.render() for metric in REGISTRY) + "\n"
+
+
+# --- Metrikalar ---
+
+HANDLER_LATENCY = Histogram(
+    "bot_handler_duration_seconds", "Handler bajarilish vaqti", labels=("event", "handler")
+)
+HANDLER_ERRORS = Counter(
+    "bot_handler_errors_total", "Xatolik bilan tugagan handlerlar", labels=("event", "handler")
+)
+DB_METHOD_LATENCY = Histogram(
+    "bot_db_method_duration_seconds", "Database metodlari bajarilish vaqti", labels=("method",)
+)
+DB_QUERY_LATENCY = Histogram(
+    "bot_db_query_duration_seconds", "SQL so'rovlar vaqti (chaqirgan Database metodi bo'yicha)",
+    labels=("method",)
+)
+DB_POOL_WAIT = Histogram(
+    "bot_db_pool_wait_seconds", "Pooldan ulanish olishni kutish vaqti", labels=("method",)
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "bot_db_pool_connections", "Pool ulanishlari holati", labels=("state",)
+)
+TELEGRAM_API_LATENCY = Histogram(
+    "bot_telegram_api_duration_seconds", "Bot API so'rovlari vaqti", labels=("method",)
+)
+TELEGRAM_API_ERRORS = Counter(
+    "bot_telegram_api_errors_total", "Xatolik bilan tugagan Bot API so'rovlari", labels=("method", "error")
+)
+LOOP_LAG = Histogram(
+    "bot_event_loop_lag_seconds", "Event loop kechikishi",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+)
+LOOP_LAG_LAST = Gauge("bot_event_loop_lag_last_seconds", "Oxirgi o'lchangan event loop kechikishi")
+
+# Joriy Database metodi (SQL so'rov va pool kutish shu metodga yoziladi)
+current_db_method: contextvars.ContextVar[str] = contextvars.ContextVar("current_db_method", default="-")
+
+
+# --- Handlerlar ---
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Inner middleware: har bir handler vaqtini nomi bo'yicha o'lchash"""
+
+    def __init__(self, event_name: str):
+        self.event_name = event_name
+
+    async def __call__(
+        self,
+        handler: Callable[[Any, Dict[str, Any]], Awaitable[Any]],
+        event: Any,
+        data: Dict[str, Any]
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+        start = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(event=self.event_name, handler=name)
+            raise
+        finally:
+            HANDLER_LATENCY.observe(time.perf_counter() - start, event=self.event_name, handler=name)
+
+
+def instrument_dispatcher(dp):
+    """Barcha yangilanish turlari uchun handler metrikasini ulash"""
+    for event_name, observer in dp.observers.items():
+        if event_name in ("update", "error"):
+            continue
+        observer.middleware(HandlerMetricsMiddleware(event_name))
+
+
+# --- Bot API ---
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Bot sessiyasi middleware: har bir API metodi vaqti"""
+
+    async def __call__(self, make_request, bot, method):
+        name = type(method).__name__
+        start = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.inc(method=name, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_API_LATENCY.observe(time.perf_counter() - start, method=name)
+
+
+def instrument_bot(bot):
+    bot.session.middleware(RequestMetricsMiddleware())
+
+
+# --- Database ---
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Ulanish olishni kutish vaqtini o'lchaydigan pool"""
+
+    def connect(self):
+        start = time.perf_counter()
+        connection = super().connect()
+        wait = time.perf_counter() - start
+        DB_POOL_WAIT.observe(wait, method=current_db_method.get())
+        # Profiler uchun (checkoutdagi birinchi so'rovga yoziladi)
+        connection.info["pool_wait"] = wait
+        return connection
+
+
+# (connection, cursor, statement, parameters, executemany, elapsed)
+QueryObserver = Callable[[Any, Any, str, Any, bool, float], None]
+
+# Engine -> kuzatuvchilar; har engine uchun bitta before/after_cursor_execute taymer
+_query_observers: "weakref.WeakKeyDictionary[Any, List[QueryObserver]]" = weakref.WeakKeyDictionary()
+
+
+def _install_query_timer(sync_engine, observers: List[QueryObserver]):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start"].pop()
+        for observer in observers:
+            observer(conn, cursor, statement, parameters, executemany, elapsed)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("query_start") if context.connection else None
+        if starts:
+            starts.pop()
+
+
+def add_query_observer(engine: AsyncEngine, observer: QueryObserver):
+    """SQL so'rov vaqtini kuzatuvchiga berish (metrikalar va profiler bitta taymerdan)"""
+    sync_engine = engine.sync_engine
+    observers = _query_observers.get(sync_engine)
+    if observers is None:
+        observers = _query_observers[sync_engine] = []
+        _install_query_timer(sync_engine, observers)
+    observers.append(observer)
+
+
+def _observe_query_latency(conn, cursor, statement, parameters, executemany, elapsed):
+    DB_QUERY_LATENCY.observe(elapsed, method=current_db_method.get())
+
+
+def instrument_engine(engine: AsyncEngine):
+    """SQLAlchemy eventlari orqali so'rov vaqtini chaqirgan metod bo'yicha yozish"""
+    sync_engine = engine.sync_engine
+    add_query_observer(engine, _observe_query_latency)
+
+    pool = sync_engine.pool
+    if isinstance(pool, AsyncAdaptedQueuePool):
+        DB_POOL_CONNECTIONS.set_function(pool.checkedout, state="checked_out")
+        DB_POOL_CONNECTIONS.set_function(pool.checkedin, state="idle")
+        DB_POOL_CONNECTIONS.set_function(lambda: max(0, pool.overflow()), state="overflow")
+
+
+def _timed_method(name: str, method):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        token = current_db_method.set(name)
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        finally:
+            DB_METHOD_LATENCY.observe(time.perf_counter() - start, method=name)
+            current_db_method.reset(token)
+    return wrapper
+
+
+def instrument_database(db):
+    """Database ning ochiq async metodlarini o'rash (nusxa darajasida)"""
+    for name, method in inspect.getmembers(db, inspect.iscoroutinefunction):
+        if name.startswith("_"):
+            continue
+        setattr(db, name, _timed_method(name, method))
+
+
+# --- Event loop ---
+
+async def monitor_loop_lag(interval: float = 0.5):
+    """sleep(interval) qancha kechikib qaytishini o'lchash"""
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - start - interval)
+        LOOP_LAG.observe(lag)
+        LOOP_LAG_LAST.set(lag)
+
+
+# --- HTTP ---
+
+class MetricsServer:
+    """/metrics (Prometheus) va /ready (readiness) uchun lokal aiohttp server"""
+
+    def __init__(self, ready_check: Optional[Callable[[], Awaitable[bool]]] = None):
+        self.ready_check = ready_check
+        self._runner: Optional[web.AppRunner] = None
+        self._lag_task: Optional[asyncio.Task] = None
+
+        self.app = web.Application()
+        self.app.router.add_get("/metrics", self.handle_metrics)
+        self.app.router.add_get("/ready", self.handle_ready)
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.Response(text=render_metrics(), content_type="text/plain", charset="utf-8")
+
+    async def handle_ready(self, request: web.Request) -> web.Response:
+        try:
+            ready = self.ready_check is None or await self.ready_check()
+        except Exception as e:
+            logger.warning(f"Readiness tekshiruvi muvaffaqiyatsiz: {e}")
+            ready = False
+        return web.Response(status=200 if ready else 503, text="ok" if ready else "not ready")
+
+    async def start(self, host: str = None, port: int = None):
+        port = config.METRICS_PORT if port is None else port
+        self._lag_task = asyncio.create_task(monitor_loop_lag())
+        if not port:
+            return
+        # Har scrape access logga yozilmasin
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host or config.METRICS_HOST, port)
+        await site.start()
+        logger.info(f"Metrikalar http://{host or config.METRICS_HOST}:{port}/metrics da")
+
+    async def stop(self):
+        if self._lag_task:
+            self._lag_task.cancel()
+            await asyncio.gather(self._lag_task, return_exceptions=True)
+            self._lag_task = None
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,93 @@
+import logging
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from aiogram import BaseMiddleware
+from aiogram.types import Update, User
+
+from cache import TTLCache
+from config import config
+from ratelimit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+THROTTLED_TEXT = "⏳ Juda tez! Iltimos, biroz kuting."
+
+
+class _UserLimit:
+    __slots__ = ("bucket", "warned")
+
+    def __init__(self, rate: float, burst: float):
+        self.bucket = TokenBucket(rate, capacity=burst)
+        self.warned = False
+
+
+class ThrottlingMiddleware(BaseMiddleware):
+    """
+    Foydalanuvchi bo'yicha anti-flood (dp.update outer middleware).
+    Har (foydalanuvchi, yangilanish turi) uchun token bucket; uzoq vaqt faol
+    bo'lmagan foydalanuvchilar keshdan chiqib ketadi (hajm va TTL bilan cheklangan).
+    Cheklangan yangilanish handlerlarga yetib bormaydi - bazaga ham, obuna tekshiruviga ham.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[float, float]]] = None,
+        maxsize: int = None,
+        idle_ttl: float = None
+    ):
+        self.limits = limits if limits is not None else config.THROTTLE_LIMITS
+        self._users = TTLCache(
+            maxsize=maxsize or config.THROTTLE_CACHE_SIZE,
+            ttl=idle_ttl or config.THROTTLE_IDLE_TTL
+        )
+        self.passed = 0
+        self.dropped: Counter = Counter()
+
+    async def __call__(
+        self,
+        handler: Callable[[Update, Dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: Dict[str, Any]
+    ) -> Any:
+        update_type = event.event_type
+        limit = self.limits.get(update_type)
+        user: Optional[User] = data.get("event_from_user")
+        if not limit or user is None or user.id == config.ADMIN_ID:
+            return await handler(event, data)
+
+        key = (user.id, update_type)
+        state = self._users.get(key)
+        if state is None:
+            state = _UserLimit(*limit)
+        # Har murojaatda qayta yozish - TTL faollikdan boshlab hisoblanadi
+        self._users.set(key, state)
+
+        if state.bucket.try_acquire():
+            state.warned = False
+            self.passed += 1
+            return await handler(event, data)
+
+        self.dropped[update_type] += 1
+        if not state.warned:
+            state.warned = True
+            await self._notify(event)
+        return None
+
+    async def _notify(self, event: Update):
+        """Cheklov haqida bitta arzon javob (inline so'rovlar jimgina tashlanadi)"""
+        try:
+            if event.message:
+                await event.message.answer(THROTTLED_TEXT)
+            elif event.callback_query:
+                await event.callback_query.answer(THROTTLED_TEXT)
+        except Exception as e:
+            logger.debug(f"Cheklov xabarini yuborib bo'lmadi: {e}")
+
+    def stats(self) -> dict:
+        return {
+            'passed': self.passed,
+            'dropped': sum(self.dropped.values()),
+            'dropped_by_type': dict(self.dropped),
+            'tracked_users': len(self._users)
+        }
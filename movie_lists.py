@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional, Sequence
+
+from config import config
+from database import Database, Movie
+from utils import format_number
+
+logger = logging.getLogger(__name__)
+
+TOP = "top"
+NEW = "new"
+
+
+def render_top_movies(movies: Sequence[Movie]) -> Optional[str]:
+    """Top kinolar matni (kinolar bo'lmasa None)"""
+    if not movies:
+        return None
+
+    lines = ["🏆 <b>Top 10 kinolar</b>\n\n"]
+    for i, movie in enumerate(movies, 1):
+        rating = movie.rating_summary
+        stars = "⭐️" * int(rating[0]) if rating[1] > 0 else "—"
+        views = format_number(movie.views_count)
+
+        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
+
+        lines.append(
+            f"{medal} <b>{movie.title}</b>\n"
+            f"   {stars} | 👁 {views} | {movie.genre}\n"
+            f"   Kod: <code>{movie.code}</code>\n\n"
+        )
+    return "".join(lines)
+
+
+def render_new_movies(movies: Sequence[Movie]) -> Optional[str]:
+    """Yangi kinolar matni (kinolar bo'lmasa None)"""
+    if not movies:
+        return None
+
+    lines = ["🆕 <b>Yangi qo'shilgan kinolar</b>\n\n"]
+    for i, movie in enumerate(movies, 1):
+        rating = movie.rating_summary
+        stars = "⭐️" * int(rating[0]) if rating[1] > 0 else "—"
+
+        lines.append(
+            f"{i}. <b>{movie.title}</b>\n"
+            f"   {stars} | {movie.genre} | {movie.quality}\n"
+            f"   Kod: <code>{movie.code}</code>\n\n"
+        )
+    return "".join(lines)
+
+
+class MovieLists:
+    """
+    Top va Yangi kinolar ro'yxatlari tayyor HTML ko'rinishida.
+    Har CACHE_TTL soniyada va katalog o'zgarganda (db.catalog_version) fonda yangilanadi,
+    shuning uchun so'rovlar bazaga murojaat qilmaydi.
+    """
+
+    def __init__(self, db: Database, ttl: float = None, limit: int = 10):
+        self.db = db
+        self.ttl = ttl or config.CACHE_TTL
+        self.limit = limit
+        self._texts: Dict[str, Optional[str]] = {}
+        self._version = -1
+        self._refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def _is_stale(self) -> bool:
+        return (
+            self._version != self.db.catalog_version
+            or time.monotonic() - self._refreshed_at >= self.ttl
+        )
+
+    async def _load(self):
+        version = self.db.catalog_version
+        top = await self.db.get_top_movies(limit=self.limit)
+        new = await self.db.get_recent_movies(limit=self.limit)
+        self._texts = {TOP: render_top_movies(top), NEW: render_new_movies(new)}
+        self._version = version
+        self._refreshed_at = time.monotonic()
+
+    async def refresh(self):
+        """Ikkala ro'yxatni qayta hisoblash"""
+        async with self._lock:
+            await self._load()
+
+    async def get(self, kind: str) -> Optional[str]:
+        """Tayyor matn; eskirgan bo'lsa (masalan fon taski hali ishlamagan) bir marta yangilanadi"""
+        if self._is_stale():
+            async with self._lock:
+                if self._is_stale():
+                    await self._load()
+        return self._texts.get(kind)
+
+    async def _refresher(self):
+        while True:
+            self.db.catalog_changed.clear()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Kino ro'yxatlarini yangilashda xatolik: {e}")
+            try:
+                await asyncio.wait_for(self.db.catalog_changed.wait(), timeout=self.ttl)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        self._task = asyncio.create_task(self._refresher())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from config import config
+from metrics import add_query_observer, current_db_method
+
+logger = logging.getLogger(__name__)
+
+# EXPLAIN faqat shu turdagi so'rovlar uchun (EXPLAIN ANALYZE emas - so'rov bajarilmaydi)
+_EXPLAINABLE = re.compile(r"^\s*(SELECT|WITH|INSERT|UPDATE|DELETE)\b", re.IGNORECASE)
+
+
+@dataclass
+class QueryStats:
+    statement: str
+    method: str
+    calls: int = 0
+    total_time: float = 0.0
+    max_time: float = 0.0
+    rows: int = 0
+    pool_wait: float = 0.0
+    slow_calls: int = 0
+    plan: Optional[str] = None
+    explained_at: float = 0.0
+
+    @property
+    def avg_time(self) -> float:
+        return self.total_time / self.calls if self.calls else 0.0
+
+
+class QueryProfiler:
+    """
+    Database.engine uchun so'rov profiler.
+    Har bir SQL (chaqirgan Database metodi bilan) vaqti, qaytgan qatorlar va pool
+    kutish vaqti yig'iladi. Chegaradan sekin so'rovlar logga yoziladi, ularning
+    EXPLAIN rejasi alohida taskda (so'rovni kutdirmasdan) olinadi.
+    """
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        threshold_ms: float = None,
+        max_statements: int = None,
+        explain: bool = None,
+        explain_interval: float = 600.0
+    ):
+        self.engine = engine
+        self.threshold = (threshold_ms if threshold_ms is not None else config.SLOW_QUERY_MS) / 1000
+        self.max_statements = max_statements or config.PROFILER_MAX_STATEMENTS
+        self.explain = config.SLOW_QUERY_EXPLAIN if explain is None else explain
+        self.explain_interval = explain_interval
+        self.stats: Dict[Tuple[str, str], QueryStats] = {}
+        self._explain_tasks: Set[asyncio.Task] = set()
+
+        add_query_observer(engine, self._observe)
+
+    def _observe(self, conn, cursor, statement, parameters, executemany, elapsed):
+        # Pool kutish vaqti checkoutdagi birinchi so'rovga yoziladi
+        pool_wait = conn.info.pop("pool_wait", 0.0)
+        rows = max(cursor.rowcount, 0)
+        method = current_db_method.get()
+
+        stats = self.stats.get((method, statement))
+        if stats is None:
+            stats = self._add(statement, method)
+        stats.calls += 1
+        stats.total_time += elapsed
+        stats.max_time = max(stats.max_time, elapsed)
+        stats.rows += rows
+        stats.pool_wait += pool_wait
+
+        if elapsed < self.threshold:
+            return
+        stats.slow_calls += 1
+        logger.warning(
+            f"Sekin so'rov {elapsed * 1000:.0f} ms ({method}, {rows} qator, "
+            f"pool {pool_wait * 1000:.0f} ms): {' '.join(statement.split())[:500]}"
+        )
+        if (
+            self.explain
+            and not executemany
+            and _EXPLAINABLE.match(statement)
+            and time.monotonic() - stats.explained_at >= self.explain_interval
+        ):
+            stats.explained_at = time.monotonic()
+            self._schedule_explain(stats, statement, parameters)
+
+    def _add(self, statement: str, method: str) -> QueryStats:
+        if len(self.stats) >= self.max_statements:
+            # Eng kam vaqt olgan so'rov chiqarib yuboriladi
+            cheapest = min(self.stats.values(), key=lambda item: item.total_time)
+            del self.stats[(cheapest.method, cheapest.statement)]
+        stats = self.stats[(method, statement)] = QueryStats(statement=statement, method=method)
+        return stats
+
+    def _schedule_explain(self, stats: QueryStats, statement: str, parameters):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        task = loop.create_task(self._explain(stats, statement, tuple(parameters or ())))
+        self._explain_tasks.add(task)
+        task.add_done_callback(self._explain_tasks.discard)
+
+    async def _explain(self, stats: QueryStats, statement: str, parameters: tuple):
+        # Task sekin so'rov metodining kontekstini meros oladi - EXPLAIN checkouti
+        # o'sha metodning pool kutish vaqtiga qo'shilmasligi kerak
+        current_db_method.set("profiler.explain")
+        try:
+            async with self.engine.connect() as conn:
+                # Bu checkoutda SQLAlchemy orqali so'rov bo'lmaydi - pool_wait keyingisiga o'tmasin
+                conn.info.pop("pool_wait", None)
+                raw = await conn.get_raw_connection()
+                # Drayver orqali to'g'ridan-to'g'ri - profiler eventlari qayta ishlamaydi
+                records = await raw.driver_connection.fetch(f"EXPLAIN {statement}", *parameters)
+            stats.plan = "\n".join(record[0] for record in records)
+            logger.info(f"EXPLAIN ({stats.method}):\n{stats.plan}")
+        except Exception as e:
+            logger.debug(f"EXPLAIN olib bo'lmadi: {e}")
+
+    def top(self, limit: int = 10, key: str = "max_time") -> List[QueryStats]:
+        """Eng sekin so'rovlar (max_time, total_time yoki avg_time bo'yicha)"""
+        return sorted(self.stats.values(), key=lambda item: getattr(item, key), reverse=True)[:limit]
+
+    def reset(self):
+        self.stats.clear()
@@ -0,0 +1,54 @@
+import asyncio
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """Token bucket tezlik cheklovchisi (rate - soniyasiga token, capacity - burst)"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        elapsed = now - self.updated_at
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1.0) -> bool:
+        """Kutmasdan token olishga urinish"""
+        now = time.monotonic()
+        if now < self.paused_until:
+            return False
+        self._refill(now)
+        if self.tokens >= tokens:
+            self.tokens -= tokens
+            return True
+        return False
+
+    async def acquire(self, tokens: float = 1.0):
+        """Token bo'shaguncha kutish (navbat bo'yicha)"""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self.paused_until:
+                    await asyncio.sleep(self.paused_until - now)
+                    continue
+                self._refill(now)
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Bucketni vaqtincha to'xtatish (masalan, TelegramRetryAfter)"""
+        now = time.monotonic()
+        self.paused_until = max(self.paused_until, now + seconds)
+        # Pauzadan keyin burst bo'lmasligi uchun tokenlarni nollash
+        self.tokens = 0.0
+        self.updated_at = self.paused_until
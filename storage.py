@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, KeyBuilder, StateType, StorageKey
+
+from cache import TTLCache
+from config import config
+from database import Database
+
+logger = logging.getLogger(__name__)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM holatlarini Postgres (fsm_states jadvali) da saqlash.
+    Bir nechta bot jarayoni bitta bazani ulashishi mumkin.
+
+    cache_ttl > 0 bo'lsa o'qishlar jarayon ichida keshlanadi - bu faqat bitta
+    foydalanuvchining yangilanishlari doim bitta jarayonga tushganda xavfsiz.
+    """
+
+    def __init__(
+        self,
+        db: Database,
+        key_builder: Optional[KeyBuilder] = None,
+        state_ttl: int = None,
+        cache_ttl: int = None,
+        cleanup_interval: int = 3600
+    ):
+        self.db = db
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True, with_destiny=True)
+        self.state_ttl = state_ttl if state_ttl is not None else config.FSM_STATE_TTL
+        cache_ttl = cache_ttl if cache_ttl is not None else config.FSM_CACHE_TTL
+        self.cache = TTLCache(maxsize=config.FSM_CACHE_SIZE, ttl=cache_ttl) if cache_ttl > 0 else None
+        self.cleanup_interval = cleanup_interval
+        self._cleanup_task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Muddati o'tgan (tashlab ketilgan) holatlarni tozalash taskini ishga tushirish"""
+        if self._cleanup_task is None:
+            self._cleanup_task = asyncio.create_task(self._cleanup())
+
+    async def _cleanup(self):
+        while True:
+            try:
+                deleted = await self.db.delete_expired_fsm_records(self._min_updated_at())
+                if deleted:
+                    logger.info(f"Muddati o'tgan FSM holatlari o'chirildi: {deleted}")
+            except Exception as e:
+                logger.error(f"FSM tozalashda xatolik: {e}")
+            await asyncio.sleep(self.cleanup_interval)
+
+    def _min_updated_at(self) -> datetime:
+        return datetime.utcnow() - timedelta(seconds=self.state_ttl)
+
+    async def _load(self, key: str) -> Dict[str, Any]:
+        if self.cache is not None:
+            record = self.cache.get(key)
+            if record is not None:
+                return record
+
+        row = await self.db.get_fsm_record(key, self._min_updated_at())
+        record = {'state': row[0], 'data': row[1]} if row else {'state': None, 'data': {}}
+        if self.cache is not None:
+            self.cache.set(key, record)
+        return record
+
+    async def _store(self, key: str, field: str, value: Any):
+        await self.db.set_fsm_field(key, **{field: value})
+        if self.cache is not None:
+            record = self.cache.peek(key)
+            if record is not None:
+                record[field] = value
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        await self._store(self.key_builder.build(key), 'state', value)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        record = await self._load(self.key_builder.build(key))
+        return record['state']
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._store(self.key_builder.build(key), 'data', data.copy())
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        record = await self._load(self.key_builder.build(key))
+        return record['data'].copy()
+
+    async def close(self) -> None:
+        if self._cleanup_task:
+            self._cleanup_task.cancel()
+            await asyncio.gather(self._cleanup_task, return_exceptions=True)
+            self._cleanup_task = None
@@ -5,10 +5,12 @@ from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 
-from database import Database
+from database import Database, Movie
+from inline_results import InlineResultCache, normalize_query
+from movie_lists import MovieLists, TOP, NEW
 from utils import (
     check_subscription, format_movie_info, format_number,
-    get_greeting, validate_rating
+    format_stats_age, get_greeting, validate_rating
 )
 from keyboards import (
     get_main_menu_kb, get_rating_kb, get_genre_kb,
@@ -58,7 +60,7 @@ async def search_movies_handler(message: Message, state: FSMContext, db: Databas
     text = f"🔍 <b>'{query}'</b> bo'yicha {len(movies)} ta natija:\n\n"
     
     for i, movie in enumerate(movies, 1):
-        rating = await db.get_movie_rating(movie.id)
+        rating = movie.rating_summary
         stars = "⭐️" * int(rating[0]) if rating[1] > 0 else "—"
         
         text += (
@@ -74,53 +76,26 @@ async def search_movies_handler(message: Message, state: FSMContext, db: Databas
 
 @router.message(F.text == "🎬 Top kinolar")
 @router.message(Command("top"))
-async def top_movies_handler(message: Message, db: Database):
+async def top_movies_handler(message: Message, movie_lists: MovieLists):
     """Top kinolar"""
-    movies = await db.get_top_movies(limit=10)
+    text = await movie_lists.get(TOP)
     
-    if not movies:
+    if not text:
         await message.answer("Hozircha kinolar yo'q.", reply_markup=get_main_menu_kb())
         return
     
-    text = "🏆 <b>Top 10 kinolar</b>\n\n"
-    
-    for i, movie in enumerate(movies, 1):
-        rating = await db.get_movie_rating(movie.id)
-        stars = "⭐️" * int(rating[0]) if rating[1] > 0 else "—"
-        views = format_number(movie.views_count)
-        
-        medal = "🥇" if i == 1 else "🥈" if i == 2 else "🥉" if i == 3 else f"{i}."
-        
-        text += (
-            f"{medal} <b>{movie.title}</b>\n"
-            f"   {stars} | 👁 {views} | {movie.genre}\n"
-            f"   Kod: <code>{movie.code}</code>\n\n"
-        )
-    
     await message.answer(text, parse_mode="HTML", reply_markup=get_main_menu_kb())
 
 @router.message(F.text == "🆕 Yangi kinolar")
 @router.message(Command("new"))
-async def new_movies_handler(message: Message, db: Database):
+async def new_movies_handler(message: Message, movie_lists: MovieLists):
     """Yangi kinolar"""
-    movies = await db.get_recent_movies(limit=10)
+    text = await movie_lists.get(NEW)
     
-    if not movies:
+    if not text:
         await message.answer("Hozircha kinolar yo'q.", reply_markup=get_main_menu_kb())
         return
     
-    text = "🆕 <b>Yangi qo'shilgan kinolar</b>\n\n"
-    
-    for i, movie in enumerate(movies, 1):
-        rating = await db.get_movie_rating(movie.id)
-        stars = "⭐️" * int(rating[0]) if rating[1] > 0 else "—"
-        
-        text += (
-            f"{i}. <b>{movie.title}</b>\n"
-            f"   {stars} | {movie.genre} | {movie.quality}\n"
-            f"   Kod: <code>{movie.code}</code>\n\n"
-        )
-    
     await message.answer(text, parse_mode="HTML", reply_markup=get_main_menu_kb())
 
 @router.message(F.text == "📊 Statistika")
@@ -128,16 +103,17 @@ async def new_movies_handler(message: Message, db: Database):
 async def user_stats_handler(message: Message, db: Database):
     """Foydalanuvchi statistikasi"""
     user_stats = await db.get_user_stats(message.from_user.id)
-    global_stats = await db.get_global_stats()
+    global_stats = await db.get_stats_snapshot()
     
     text = f"📊 <b>Sizning statistikangiz</b>\n\n"
     text += f"👁 Ko'rilgan kinolar: {user_stats['views_count']}\n"
     text += f"⭐️ Berilgan baholar: {user_stats['ratings_count']}\n\n"
     
     text += f"🌍 <b>Umumiy statistika</b>\n\n"
-    text += f"👥 Foydalanuvchilar: {format_number(global_stats['users_count'])}\n"
-    text += f"🎬 Kinolar: {format_number(global_stats['movies_count'])}\n"
-    text += f"👁 Jami ko'rishlar: {format_number(global_stats['total_views'])}\n"
+    text += f"👥 Foydalanuvchilar: {format_number(global_stats.users_count)}\n"
+    text += f"🎬 Kinolar: {format_number(global_stats.movies_count)}\n"
+    text += f"👁 Jami ko'rishlar: {format_number(global_stats.total_views)}\n\n"
+    text += format_stats_age(global_stats.refreshed_at)
     
     await message.answer(text, parse_mode="HTML", reply_markup=get_main_menu_kb())
 
@@ -197,11 +173,8 @@ async def save_rating_callback(call: CallbackQuery, state: FSMContext, db: Datab
         await call.answer("❌ Kino topilmadi!", show_alert=True)
         return
     
-    # Bahoni saqlash
-    await db.add_rating(call.from_user.id, movie.id, rating)
-    
-    # Yangilangan reytingni olish
-    avg_rating, count = await db.get_movie_rating(movie.id)
+    # Bahoni saqlash (yangilangan reyting qaytadi)
+    avg_rating, count = await db.add_rating(call.from_user.id, movie.id, rating)
     
     await call.message.edit_text(
         f"✅ Rahmat! Sizning bahongiz qabul qilindi.\n\n"
@@ -228,7 +201,7 @@ async def movie_stats_callback(call: CallbackQuery, db: Database):
         await call.answer("❌ Kino topilmadi!", show_alert=True)
         return
     
-    rating = await db.get_movie_rating(movie.id)
+    rating = movie.rating_summary
     
     text = f"📊 <b>{movie.title}</b>\n\n"
     text += f"👁 Ko'rishlar: {format_number(movie.views_count)}\n"
@@ -246,6 +219,26 @@ async def movie_stats_callback(call: CallbackQuery, db: Database):
 
 # --- Inline Mode ---
 
+INLINE_LIMIT = 20
+_inline_cache = InlineResultCache()
+
+def build_inline_result(movie: Movie, bot_username: str) -> InlineQueryResultArticle:
+    rating = movie.rating_summary
+    stars = "⭐️" * int(rating[0]) if rating[1] > 0 else ""
+    
+    return InlineQueryResultArticle(
+        id=str(movie.id),
+        title=movie.title,
+        description=f"{movie.genre} | {movie.quality} {stars}",
+        input_message_content=InputTextMessageContent(
+            message_text=f"🎬 <b>{movie.title}</b>\n\n"
+                       f"{movie.genre} | {movie.quality}\n"
+                       f"Kod: <code>{movie.code}</code>\n\n"
+                       f"👉 @{bot_username}",
+            parse_mode="HTML"
+        )
+    )
+
 @router.inline_query()
 async def inline_query_handler(inline_query: InlineQuery, db: Database):
     """Inline rejim"""
@@ -255,6 +248,9 @@ async def inline_query_handler(inline_query: InlineQuery, db: Database):
         await inline_query.answer([])
         return
     
+    # Bot ma'lumotlari startupda olinadi va keshlanadi
+    bot_info = await inline_query.bot.me()
+    
     # Agar kod kiritilgan bo'lsa
     if query.startswith("code_"):
         try:
@@ -262,7 +258,6 @@ async def inline_query_handler(inline_query: InlineQuery, db: Database):
             movie = await db.get_movie_by_code(code)
             
             if movie:
-                bot_info = await inline_query.bot.get_me()
                 results = [
                     InlineQueryResultArticle(
                         id=str(movie.id),
@@ -280,33 +275,21 @@ async def inline_query_handler(inline_query: InlineQuery, db: Database):
         except (ValueError, IndexError):
             pass
     
-    # Qidiruv
-    movies = await db.search_movies(query, limit=20)
+    # Qidiruv (avval kesh)
+    key = normalize_query(query)
+    results = _inline_cache.get(key, db.catalog_version, reuse_prefix=not db.search_indexed)
     
-    if not movies:
+    if results is None:
+        movies = await db.search_movies(key, limit=INLINE_LIMIT)
+        entries = [
+            ((movie.title.lower(), movie.genre.lower()), build_inline_result(movie, bot_info.username))
+            for movie in movies
+        ]
+        _inline_cache.set(key, db.catalog_version, entries, complete=len(movies) < INLINE_LIMIT)
+        results = [result for _, result in entries]
+    
+    if not results:
         await inline_query.answer([])
         return
     
-    bot_info = await inline_query.bot.get_me()
-    results = []
-    
-    for movie in movies:
-        rating = await db.get_movie_rating(movie.id)
-        stars = "⭐️" * int(rating[0]) if rating[1] > 0 else ""
-        
-        results.append(
-            InlineQueryResultArticle(
-                id=str(movie.id),
-                title=movie.title,
-                description=f"{movie.genre} | {movie.quality} {stars}",
-                input_message_content=InputTextMessageContent(
-                    message_text=f"🎬 <b>{movie.title}</b>\n\n"
-                               f"{movie.genre} | {movie.quality}\n"
-                               f"Kod: <code>{movie.code}</code>\n\n"
-                               f"👉 @{bot_info.username}",
-                    parse_mode="HTML"
-                )
-            )
-        )
-    
-    await inline_query.answer(results, cache_time=300)
\ No newline at end of file
+    await inline_query.answer(results, cache_time=300)
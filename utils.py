@@ -1,39 +1,91 @@
+import asyncio
 import logging
-from typing import Tuple, Optional
+from typing import Tuple, Optional, Sequence
 from datetime import datetime
 from aiogram import Bot
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.utils.keyboard import InlineKeyboardBuilder
-from database import Database, Movie
+from database import Database, Movie, RequiredChannel, MEDIA_VIDEO, MEDIA_DOCUMENT
+from cache import TTLCache
+from config import config
 
 logger = logging.getLogger(__name__)
 
-async def check_subscription(user_id: int, db: Database, bot: Bot) -> Tuple[bool, Optional[InlineKeyboardMarkup]]:
+# Majburiy obuna keshlari
+_channels_cache = TTLCache(maxsize=1, ttl=config.CACHE_TTL)
+_membership_cache = TTLCache(maxsize=config.SUBSCRIPTION_CACHE_SIZE, ttl=config.CACHE_TTL)
+_channel_links_cache = TTLCache(maxsize=config.SUBSCRIPTION_CACHE_SIZE, ttl=config.CACHE_TTL)
+
+def invalidate_subscription_cache():
+    """Kanallar ro'yxati o'zgarganda keshni tozalash"""
+    _channels_cache.clear()
+    _membership_cache.clear()
+    _channel_links_cache.clear()
+
+async def get_required_channels_cached(db: Database) -> Sequence[RequiredChannel]:
+    """Majburiy kanallar ro'yxati (keshlangan, db.channels_version o'zgarsa qayta o'qiladi)"""
+    key = ('channels', db.channels_version)
+    channels = _channels_cache.get(key)
+    if channels is None:
+        channels = await db.get_required_channels()
+        _channels_cache.set(key, channels)
+    return channels
+
+async def _is_member(bot: Bot, user_id: int, channel_id: int) -> Optional[bool]:
+    """Bitta kanal a'zoligini timeout bilan tekshirish (xatolikda None)"""
+    try:
+        member = await asyncio.wait_for(
+            bot.get_chat_member(chat_id=channel_id, user_id=user_id),
+            timeout=config.SUBSCRIPTION_CHECK_TIMEOUT
+        )
+    except Exception as e:
+        logger.warning(f"Kanal tekshirishda xatolik {channel_id}: {e!r}")
+        return None
+    return member.status not in ['left', 'kicked']
+
+async def check_subscription(
+    user_id: int, db: Database, bot: Bot, recheck: bool = False
+) -> Tuple[bool, Optional[InlineKeyboardMarkup]]:
     """
     Majburiy obuna kanallarini tekshiradi
+    recheck=True bo'lsa, keshdagi salbiy natijalar qayta tekshiriladi
     Returns: (is_subscribed, keyboard)
     """
-    channels = await db.get_required_channels()
+    channels = await get_required_channels_cached(db)
     if not channels:
         return True, None
     
-    not_subscribed_channels = []
-    
+    results = {}
+    to_check = []
     for ch in channels:
-        try:
-            member = await bot.get_chat_member(chat_id=ch.channel_id, user_id=user_id)
-            if member.status in ['left', 'kicked']:
-                not_subscribed_channels.append(ch)
-        except Exception as e:
-            logger.warning(f"Kanal tekshirishda xatolik {ch.channel_id}: {e}")
-            not_subscribed_channels.append(ch)
+        is_member = _membership_cache.get((user_id, ch.channel_id))
+        if is_member is None or (recheck and not is_member):
+            to_check.append(ch)
+        else:
+            results[ch.channel_id] = is_member
     
+    # Keshda yo'q kanallarni parallel tekshirish
+    if to_check:
+        checked = await asyncio.gather(*(_is_member(bot, user_id, ch.channel_id) for ch in to_check))
+        for ch, is_member in zip(to_check, checked):
+            if is_member is None:
+                # Xatolik keshlanmaydi
+                results[ch.channel_id] = False
+                continue
+            # Obuna bo'lmaganlar tezroq qayta tekshiriladi
+            ttl = None if is_member else config.SUBSCRIPTION_NEGATIVE_TTL
+            _membership_cache.set((user_id, ch.channel_id), is_member, ttl=ttl)
+            results[ch.channel_id] = is_member
+    
+    not_subscribed_channels = [ch for ch in channels if not results[ch.channel_id]]
     if not not_subscribed_channels:
         return True, None
     
     kb = InlineKeyboardBuilder()
     for ch in not_subscribed_channels:
-        url_link = await get_channel_invite_link(bot, ch.channel_id)
+        url_link = channel_url(ch)
+        if not url_link:
+            url_link = await fill_channel_link(bot, db, ch)
         kb.button(text=f"➕ {ch.title}", url=url_link)
     
     kb.button(text="✅ Obuna bo'ldim, tekshirish", callback_data="check_fsub")
@@ -41,56 +93,101 @@ async def check_subscription(user_id: int, db: Database, bot: Bot) -> Tuple[bool
     
     return False, kb.as_markup()
 
-async def get_channel_invite_link(bot: Bot, channel_id: int) -> str:
-    """Kanal linkini olish"""
+def build_channel_url(username: str = None, invite_link: str = None) -> Optional[str]:
+    """Saqlangan ma'lumotlardan kanal linkini yasash"""
+    if username:
+        return f"https://t.me/{username}"
+    if invite_link:
+        return invite_link
+    return None
+
+def channel_url(ch: RequiredChannel) -> Optional[str]:
+    return build_channel_url(ch.username, ch.invite_link)
+
+async def fill_channel_link(bot: Bot, db: Database, ch: RequiredChannel) -> str:
+    """Eski yozuvlar uchun linkni bir marta olib bazaga saqlash"""
+    # Link topilmagan (yopiq, invite linksiz) kanallar ham keshlanadi - har so'rovda get_chat qilinmaydi
+    url_link = _channel_links_cache.get(ch.channel_id)
+    if url_link is not None:
+        return url_link
     try:
-        chat_info = await bot.get_chat(channel_id)
-        if chat_info.username:
-            return f"https://t.me/{chat_info.username}"
-        elif channel_id < 0:
-            return f"https://t.me/c/{str(channel_id)[4:]}"
-    except Exception:
-        pass
-    return "https://t.me/"
+        chat_info = await bot.get_chat(ch.channel_id)
+        if chat_info.username or chat_info.invite_link:
+            ch.username, ch.invite_link = chat_info.username, chat_info.invite_link
+            await db.update_required_channel_link(ch.channel_id, ch.username, ch.invite_link)
+    except Exception as e:
+        logger.warning(f"Kanal linkini olishda xatolik {ch.channel_id}: {e}")
+    
+    url_link = channel_url(ch)
+    if not url_link:
+        if ch.channel_id < 0:
+            url_link = f"https://t.me/c/{str(ch.channel_id)[4:]}"
+        else:
+            url_link = "https://t.me/"
+    _channel_links_cache.set(ch.channel_id, url_link)
+    return url_link
 
-def format_movie_info(movie: Movie, rating: Tuple[float, int] = None, include_stats: bool = False) -> str:
-    """Kino ma'lumotlarini formatlash"""
-    text = f"🎬 <b>{movie.title}</b>\n\n"
+# Rating yulduzlari va caption statik qismlari keshi
+_RATING_STARS = tuple("⭐️" * i for i in range(6))
+_caption_cache = TTLCache(maxsize=config.MOVIE_CACHE_SIZE, ttl=config.CACHE_TTL)
+
+def _render_caption_parts(movie: Movie) -> Tuple[str, str]:
+    """Caption ning o'zgarmas qismlari: (sarlavha va ma'lumotlar, kod)"""
+    lines = [f"🎬 <b>{movie.title}</b>\n\n"]
     
     if movie.description:
-        text += f"📝 {movie.description}\n\n"
+        lines.append(f"📝 {movie.description}\n\n")
     
-    text += f"🎭 Janr: {movie.genre}\n"
+    lines.append(f"🎭 Janr: {movie.genre}\n")
     
     if movie.year:
-        text += f"📅 Yil: {movie.year}\n"
+        lines.append(f"📅 Yil: {movie.year}\n")
     
     if movie.country:
-        text += f"🌍 Mamlakat: {movie.country}\n"
+        lines.append(f"🌍 Mamlakat: {movie.country}\n")
     
     if movie.duration:
         hours = movie.duration // 60
         minutes = movie.duration % 60
         duration_str = f"{hours}s {minutes}d" if hours > 0 else f"{minutes}d"
-        text += f"⏱ Davomiyligi: {duration_str}\n"
+        lines.append(f"⏱ Davomiyligi: {duration_str}\n")
     
-    text += f"🎥 Sifat: {movie.quality}\n"
+    lines.append(f"🎥 Sifat: {movie.quality}\n")
     
     if movie.imdb_rating:
-        text += f"⭐️ IMDb: {movie.imdb_rating}/10\n"
+        lines.append(f"⭐️ IMDb: {movie.imdb_rating}/10\n")
+    
+    return "".join(lines), f"\n🔢 Kod: <code>{movie.code}</code>"
+
+def format_movie_info(movie: Movie, rating: Tuple[float, int] = None, include_stats: bool = False) -> str:
+    """
+    Kino ma'lumotlarini formatlash.
+    Statik qism (id, version) bo'yicha keshlanadi, baho va ko'rishlar har safar qo'shiladi.
+    """
+    key = (movie.id, movie.version)
+    parts = _caption_cache.get(key)
+    if parts is None:
+        parts = _render_caption_parts(movie)
+        if movie.id is not None:
+            _caption_cache.set(key, parts)
+    head, tail = parts
     
+    rating_line = ""
     if rating:
         avg_rating, count = rating
         if count > 0:
-            stars = "⭐️" * int(avg_rating)
-            text += f"📊 Baho: {stars} ({avg_rating}/5) - {count} ta ovoz\n"
+            rating_line = f"📊 Baho: {_RATING_STARS[int(avg_rating)]} ({avg_rating}/5) - {count} ta ovoz\n"
     
-    if include_stats:
-        text += f"👁 Ko'rishlar: {movie.views_count}\n"
+    stats_line = f"👁 Ko'rishlar: {movie.views_count}\n" if include_stats else ""
     
-    text += f"\n🔢 Kod: <code>{movie.code}</code>"
-    
-    return text
+    return f"{head}{rating_line}{stats_line}{tail}"
+
+def format_stats_age(refreshed_at: datetime) -> str:
+    """Statistika qanchalik yangi ekanini ko'rsatish"""
+    minutes = int((datetime.utcnow() - refreshed_at).total_seconds() // 60)
+    if minutes < 1:
+        return "🕒 Hozirgina yangilandi"
+    return f"🕒 {minutes} daqiqa oldin yangilangan"
 
 def format_duration(minutes: int) -> str:
     """Davomiylikni formatlash"""
@@ -128,10 +225,14 @@ def escape_markdown(text: str) -> str:
         text = text.replace(char, f'\\{char}')
     return text
 
-async def send_movie_with_caption(bot: Bot, chat_id: int, movie: Movie, caption: str, reply_markup=None):
-    """Kinoni caption bilan yuborish"""
-    try:
-        if movie.thumbnail_file_id:
+async def send_movie_with_caption(bot: Bot, chat_id: int, movie: Movie, caption: str, reply_markup=None) -> str:
+    """
+    Kinoni caption bilan yuborish.
+    Media turi ma'lum bo'lsa to'g'ridan-to'g'ri mos usul ishlatiladi.
+    Ishlagan usul (MEDIA_VIDEO / MEDIA_DOCUMENT) qaytariladi.
+    """
+    if movie.media_type != MEDIA_DOCUMENT:
+        try:
             await bot.send_video(
                 chat_id=chat_id,
                 video=movie.file_id,
@@ -140,28 +241,24 @@ async def send_movie_with_caption(bot: Bot, chat_id: int, movie: Movie, caption:
                 reply_markup=reply_markup,
                 parse_mode="HTML"
             )
-        else:
-            await bot.send_video(
-                chat_id=chat_id,
-                video=movie.file_id,
-                caption=caption,
-                reply_markup=reply_markup,
-                parse_mode="HTML"
-            )
-    except Exception as e:
-        logger.error(f"Video yuborishda xatolik: {e}")
-        # Document sifatida yuborishga harakat
-        try:
-            await bot.send_document(
-                chat_id=chat_id,
-                document=movie.file_id,
-                caption=caption,
-                reply_markup=reply_markup,
-                parse_mode="HTML"
-            )
-        except Exception as doc_error:
-            logger.error(f"Document yuborishda xatolik: {doc_error}")
-            raise
+            return MEDIA_VIDEO
+        except Exception as e:
+            if movie.media_type == MEDIA_VIDEO:
+                raise
+            logger.warning(f"Video yuborib bo'lmadi, document sifatida yuborilmoqda: {e}")
+
+    try:
+        await bot.send_document(
+            chat_id=chat_id,
+            document=movie.file_id,
+            caption=caption,
+            reply_markup=reply_markup,
+            parse_mode="HTML"
+        )
+        return MEDIA_DOCUMENT
+    except Exception as doc_error:
+        logger.error(f"Document yuborishda xatolik: {doc_error}")
+        raise
 
 def validate_rating(rating: int) -> bool:
     """Baho validatsiyasi"""
@@ -183,6 +280,9 @@ async def log_admin_action(db: Database, admin_id: int, action: str, details: st
 
 def create_progress_bar(current: int, total: int, length: int = 10) -> str:
     """Progress bar yaratish"""
+    if total <= 0:
+        current, total = 1, 1
+    current = min(current, total)
     filled = int((current / total) * length)
     bar = '█' * filled + '░' * (length - filled)
     percentage = int((current / total) * 100)
@@ -0,0 +1,101 @@
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+UpdateHandler = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+
+class WebhookServer:
+    """
+    Webhook uchun aiohttp server.
+    So'rovga darhol 200 qaytariladi, yangilanishlar navbat orqali
+    cheklangan sondagi workerlarda parallel qayta ishlanadi.
+    Navbat to'lsa 503 qaytariladi - Telegram yangilanishni keyinroq qayta yuboradi.
+    """
+
+    def __init__(
+        self,
+        handler: UpdateHandler,
+        path: str = None,
+        secret: Optional[str] = None,
+        workers: int = None,
+        queue_size: int = None,
+        enqueue_timeout: float = 1.0
+    ):
+        self.handler = handler
+        self.path = path or config.WEBHOOK_PATH
+        self.secret = secret if secret is not None else config.WEBHOOK_SECRET
+        self.workers = workers or config.WEBHOOK_MAX_IN_FLIGHT
+        self.enqueue_timeout = enqueue_timeout
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or config.WEBHOOK_QUEUE_SIZE)
+        self.stats = {'accepted': 0, 'rejected': 0, 'processed': 0, 'failed': 0}
+        self._tasks: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self.handle)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if self.secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != self.secret:
+            return web.Response(status=401)
+
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(update, dict):
+            return web.Response(status=400)
+
+        try:
+            await asyncio.wait_for(self.queue.put(update), timeout=self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            self.stats['rejected'] += 1
+            logger.debug("Webhook navbati to'la, yangilanish rad etildi")
+            return web.Response(status=503)
+
+        self.stats['accepted'] += 1
+        return web.Response()
+
+    async def _worker(self):
+        while True:
+            update = await self.queue.get()
+            update_id = update.get("update_id")
+            try:
+                await self.handler(update)
+                self.stats['processed'] += 1
+            except Exception as e:
+                self.stats['failed'] += 1
+                logger.exception(f"Yangilanishni qayta ishlashda xatolik ({update_id}): {e}")
+            finally:
+                self.queue.task_done()
+
+    async def start(self, host: str = None, port: int = None):
+        # Sirsiz har kim (ADMIN_ID nomidan ham) soxta yangilanish yubora oladi
+        if not self.secret:
+            raise RuntimeError("Webhook rejimi uchun WEBHOOK_SECRET o'rnatilishi shart")
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host or config.WEBHOOK_HOST, port or config.WEBHOOK_PORT)
+        await site.start()
+        logger.info(f"Webhook server {host or config.WEBHOOK_HOST}:{port or config.WEBHOOK_PORT}{self.path} da ishlamoqda")
+
+    async def stop(self, drain_timeout: float = 10.0):
+        """Yangi so'rovlarni to'xtatib, navbatdagilarni tugatish"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout=drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook navbatida {self.queue.qsize()} ta yangilanish qoldi")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
@@ -0,0 +1,177 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import queue as queue_module
+import signal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from aiogram import Bot
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+STOP = None  # workerga yuboriladigan to'xtash belgisi
+
+
+def extract_user_id(update: Dict[str, Any]) -> int:
+    """Yangilanish egasining ID si (from_user, bo'lmasa chat)"""
+    for key, value in update.items():
+        if key == "update_id" or not isinstance(value, dict):
+            continue
+        if isinstance(value.get("from"), dict):
+            return value["from"]["id"]
+        if isinstance(value.get("chat"), dict):
+            return value["chat"]["id"]
+        if isinstance(value.get("user"), dict):
+            return value["user"]["id"]
+    return 0
+
+
+class UpdateRouter:
+    """
+    Yangilanishlarni N ta worker jarayonga from_user.id bo'yicha taqsimlash.
+    Bitta foydalanuvchining yangilanishlari doim bitta workerga tushadi.
+    """
+
+    def __init__(self, processes: int):
+        ctx = multiprocessing.get_context("spawn")
+        self.queues = [ctx.Queue(maxsize=config.WORKER_QUEUE_SIZE) for _ in range(processes)]
+        self.processes = [
+            ctx.Process(target=worker_process, args=(index, queue), name=f"bot-worker-{index}")
+            for index, queue in enumerate(self.queues)
+        ]
+
+    def start(self):
+        for process in self.processes:
+            process.start()
+        logger.info(f"{len(self.processes)} ta worker jarayon ishga tushdi")
+
+    async def dispatch(self, update: Dict[str, Any]):
+        queue = self.queues[extract_user_id(update) % len(self.queues)]
+        try:
+            queue.put_nowait(update)
+        except queue_module.Full:
+            # Worker ortda qolgan - joy bo'shaguncha polling/webhook ham kutadi
+            await asyncio.get_running_loop().run_in_executor(None, queue.put, update)
+
+    async def stop(self, timeout: float = 30.0):
+        """Workerlarga to'xtash belgisini yuborib, navbatni tugatishini kutish"""
+        loop = asyncio.get_running_loop()
+        # Navbat to'la bo'lsa put bloklanadi - event loop to'xtab qolmasligi uchun executorda
+        for queue in self.queues:
+            await loop.run_in_executor(None, queue.put, STOP)
+        for process in self.processes:
+            await loop.run_in_executor(None, process.join, timeout)
+            if process.is_alive():
+                logger.warning(f"{process.name} o'z vaqtida to'xtamadi, majburan to'xtatilmoqda")
+                process.terminate()
+
+
+async def poll_updates(
+    bot: Bot,
+    handler: Callable[[Dict[str, Any]], Awaitable[Any]],
+    allowed_updates: List[str],
+    stop_event: asyncio.Event,
+    polling_timeout: int = 30
+):
+    """getUpdates orqali yangilanishlarni olib, handlerga JSON ko'rinishida berish"""
+    offset: Optional[int] = None
+    stop_task = asyncio.create_task(stop_event.wait())
+    while not stop_event.is_set():
+        request = asyncio.create_task(bot.get_updates(
+            offset=offset,
+            timeout=polling_timeout,
+            allowed_updates=allowed_updates,
+            request_timeout=polling_timeout + 10
+        ))
+        # Long polling to'xtash signalini kutib qolmasligi uchun
+        await asyncio.wait({request, stop_task}, return_when=asyncio.FIRST_COMPLETED)
+        if stop_event.is_set():
+            request.cancel()
+            await asyncio.gather(request, return_exceptions=True)
+            break
+        try:
+            updates = request.result()
+        except Exception as e:
+            logger.error(f"getUpdates xatoligi: {e}")
+            await asyncio.sleep(1)
+            continue
+
+        for update in updates:
+            offset = update.update_id + 1
+            await handler(update.model_dump(mode="json", by_alias=True, exclude_none=True))
+
+
+def worker_process(index: int, queue: multiprocessing.Queue):
+    """Worker jarayon kirish nuqtasi"""
+    # Ctrl+C butun guruhga keladi - worker faqat STOP belgisi bilan to'xtaydi
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_worker_main(index, queue))
+
+
+async def _worker_main(index: int, queue: multiprocessing.Queue):
+    # Har bir jarayon o'z Bot, Database (pool) va Dispatcher nusxasiga ega
+    import main as app
+
+    app.setup_dispatcher()
+    # init_db (DDL) faqat asosiy jarayonda - bu yerda faqat indekslar aniqlanadi
+    await app.db.detect_search_indexes()
+    await app.bot.me()
+    app.db.start_background_tasks()
+    app.movie_lists.start()
+    # Har worker o'z portida (0 - o'chirilgan)
+    await app.metrics_server.start(port=config.METRICS_PORT + 1 + index if config.METRICS_PORT else 0)
+    if app.storage:
+        await app.storage.start()
+    if index == 0:
+        # Rassilkalar faqat bitta workerda davom ettiriladi
+        await app.resume_broadcast_jobs(app.bot, app.db)
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(config.WORKER_MAX_IN_FLIGHT)
+    in_flight: Set[asyncio.Task] = set()
+    # Foydalanuvchi -> uning oxirgi yangilanishi taski. Bitta foydalanuvchining
+    # yangilanishlari navbat bilan, turli foydalanuvchilarniki parallel ishlanadi
+    tails: Dict[int, asyncio.Task] = {}
+
+    async def process(update: Dict[str, Any], previous: Optional[asyncio.Task]):
+        try:
+            if previous is not None:
+                # Oldingi yangilanish xatosi bu yerga o'tmasligi uchun wait
+                await asyncio.wait({previous})
+            await app.process_raw_update(update)
+        except Exception as e:
+            logger.exception(f"Worker {index}: yangilanish {update.get('update_id')} xatoligi: {e}")
+        finally:
+            semaphore.release()
+
+    def forget(user_id: int, task: asyncio.Task):
+        in_flight.discard(task)
+        if tails.get(user_id) is task:
+            del tails[user_id]
+
+    logger.info(f"Worker {index} tayyor")
+    try:
+        while True:
+            update = await loop.run_in_executor(None, queue.get)
+            if update is STOP:
+                break
+            await semaphore.acquire()
+            user_id = extract_user_id(update)
+            task = asyncio.create_task(process(update, tails.get(user_id)))
+            tails[user_id] = task
+            in_flight.add(task)
+            task.add_done_callback(functools.partial(forget, user_id))
+    finally:
+        if in_flight:
+            await asyncio.gather(*in_flight, return_exceptions=True)
+        await app.movie_lists.stop()
+        await app.metrics_server.stop()
+        await app.db.stop_background_tasks()
+        if app.storage:
+            await app.storage.close()
+        await app.bot.session.close()
+        await app.db.engine.dispose()
+        logger.info(f"Worker {index} to'xtadi")